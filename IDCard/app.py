@@ -1,15 +1,15 @@
 import os
-import random
+import sys
 from tkinter import *
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageDraw, ImageFont
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from io import BytesIO
+from PIL import ImageTk
 
-# Function to generate a 10-digit unique ID
-def generate_id():
-    return ''.join(random.choices('0123456789', k=10))
+# Make the shared idcard_core package at the repository root importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from idcard_core.renderer import CardRenderer
+
+# Single-sided 800x500 card (idcard_core/layouts/plain.json) on background.png next to this script
+renderer = CardRenderer("plain", assets_dir=os.path.dirname(os.path.abspath(__file__)))
 
 # Function to create the ID card
 def create_id_card():
@@ -22,41 +22,20 @@ def create_id_card():
         messagebox.showerror("Error", "Please fill all fields and select a photo.")
         return
 
-    # Generate ID
-    id_number = generate_id()
-
-    # Load background image
-    background = Image.open("background.png")  # Replace with your background image
-    background = background.resize((800, 500))  # Resize to ID card size
-
-    # Load user photo
-    user_photo = Image.open(photo_path).resize((150, 150))
-
-    # Paste user photo onto the background
-    background.paste(user_photo, (50, 150))
-
-    # Draw text on the image
-    draw = ImageDraw.Draw(background)
-    font = ImageFont.load_default()  # Use default font or load a custom font
-    draw.text((220, 160), f"Name: {full_name}", fill="black", font=font)
-    draw.text((220, 200), f"ID: {id_number}", fill="black", font=font)
-    draw.text((220, 240), f"Address: {address}", fill="black", font=font)
-
-    # Save the ID card image
-    id_card_path = f"id_card_{id_number}.png"
-    background.save(id_card_path)
+    # Issue an ID, render the card and save it
+    card = renderer.render(full_name=full_name, address=address, photo_path=photo_path,
+                           front_path="id_card_{id_number}.png")
 
     # Show success message
-    messagebox.showinfo("Success", f"ID card saved as {id_card_path}")
-    preview_id_card(id_card_path)
+    messagebox.showinfo("Success", f"ID card saved as {card.paths['front']}")
+    preview_id_card(card)
 
 # Function to preview the ID card
-def preview_id_card(image_path):
+def preview_id_card(card):
     preview_window = Toplevel(root)
     preview_window.title("ID Card Preview")
 
-    img = Image.open(image_path)
-    img = img.resize((400, 250))  # Resize for preview
+    img = card.thumbnail("front", (400, 250))  # Resized in memory for preview
     img = ImageTk.PhotoImage(img)
 
     label = Label(preview_window, image=img)
@@ -64,25 +43,15 @@ def preview_id_card(image_path):
     label.pack()
 
     # Add a button to print the ID card as PDF
-    Button(preview_window, text="Print as PDF", command=lambda: print_pdf(image_path)).pack()
+    Button(preview_window, text="Print as PDF", command=lambda: print_pdf(card)).pack()
 
 # Function to print the ID card as PDF
-def print_pdf(image_path):
+def print_pdf(card):
     pdf_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
     if not pdf_path:
         return
 
-    # Create a PDF
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-    img = Image.open(image_path)
-    img_bytes = BytesIO()
-    img.save(img_bytes, format="PNG")
-    img_bytes.seek(0)
-
-    # Draw the image on the PDF
-    c.drawImage(img_bytes, 50, 700, width=400, height=250)
-    c.save()
-
+    renderer.write_pdf(card, pdf_path)  # Straight from the in-memory image
     messagebox.showinfo("Success", f"PDF saved as {pdf_path}")
 
 # Function to select a photo
@@ -1,129 +1,62 @@
 import os
-import random
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, send_file, redirect, url_for
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-import barcode
-from barcode.writer import ImageWriter
+import sys
+from flask import Flask, abort, jsonify, render_template, render_template_string, request, send_file, redirect, url_for
+from PIL import Image
+
+# Make the shared idcard_core package at the repository root importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from idcard_core.encoding import PRINT_PROFILES, profile_extension
+from idcard_core.httpcache import THUMBNAIL_FORMATS, card_thumbnail, file_digest, is_content_addressed
+from idcard_core.jobs import QueueFull, RenderQueue
+from idcard_core.photos import MAX_UPLOAD_BYTES, PhotoTooLarge, read_upload
+from idcard_core.photostore import PhotoStore
+from idcard_core.profiling import profiled
+from idcard_core.renderer import CardRenderer
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'static/id_cards'
+# Reject oversized requests before they are parsed (photo cap plus room for the form fields)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
+# Render cards on background workers; the POST returns as soon as the job is queued
+app.config['RENDER_ASYNC'] = os.environ.get("IDCARD_RENDER_ASYNC", "1") != "0"
+app.config['RENDER_WORKERS'] = int(os.environ.get("IDCARD_RENDER_WORKERS", "2"))
+app.config['RENDER_QUEUE_SIZE'] = int(os.environ.get("IDCARD_RENDER_QUEUE_SIZE", "32"))
+
+# Encoding of the saved card fronts: fast, default or archival (see idcard_core.encoding)
+app.config['OUTPUT_PROFILE'] = os.environ.get("IDCARD_OUTPUT_PROFILE", "default")
+if app.config['OUTPUT_PROFILE'] not in PRINT_PROFILES:
+    raise ValueError(f"IDCARD_OUTPUT_PROFILE must be one of {', '.join(PRINT_PROFILES)}")
+
+# Uploaded photos, stored once per distinct content together with their card-ready thumbnail
+app.config['PHOTO_STORE'] = 'photo_store'
+photo_store = PhotoStore(app.config['PHOTO_STORE'])
+
+# Browser caching of card images: content-addressed files never change, the rest revalidate by ETag
+app.config['IMMUTABLE_MAX_AGE'] = 365 * 24 * 3600
+app.config['PREVIEW_WIDTH'] = 505
+
+render_queue = RenderQueue(workers=app.config['RENDER_WORKERS'], max_pending=app.config['RENDER_QUEUE_SIZE'])
+
+# Web KDO card (idcard_core/layouts/kdo_web.json), backgrounds in static/images
+renderer = CardRenderer("kdo_web", assets_dir=os.path.join(app.root_path, "static", "images"))
 
 # Australian standard card size in pixels (85.6 mm x 54 mm at 300 DPI)
-CARD_WIDTH = 1010  # 85.6 mm * 300 DPI / 25.4 mm/inch
-CARD_HEIGHT = 637   # 54 mm * 300 DPI / 25.4 mm/inch
-
-# Function to generate a 10-digit unique ID
-def generate_id():
-    return ''.join(random.choices('0123456789', k=9))
-
-# Function to create rounded corners for the ID card
-def round_corners(image, radius=30):
-    circle = Image.new('L', (radius * 2, radius * 2), 0)
-    draw = ImageDraw.Draw(circle)
-    draw.ellipse((0, 0, radius * 2, radius * 2), fill=255)
-    alpha = Image.new('L', image.size, 255)
-    w, h = image.size
-    alpha.paste(circle.crop((0, 0, radius, radius)), (0, 0))
-    alpha.paste(circle.crop((radius, 0, radius * 2, radius)), (w - radius, 0))
-    alpha.paste(circle.crop((0, radius, radius, radius * 2)), (0, h - radius))
-    alpha.paste(circle.crop((radius, radius, radius * 2, radius * 2)), (w - radius, h - radius))
-    image.putalpha(alpha)
-    return image
-
-# Function to generate a barcode with a white foreground and transparent background
-def generate_barcode(id_number):
-    code = barcode.get('code39', id_number, writer=ImageWriter())
-    barcode_path = f"static/id_cards/barcode_{id_number}"
-    code.save(barcode_path)  # Save the barcode as an image
-
-    # Open the barcode image and make the background transparent
-    barcode_img = Image.open(f"{barcode_path}.png")
-    barcode_img = barcode_img.convert("RGBA")  # Convert to RGBA for transparency
-    data = barcode_img.getdata()
-
-    # Make white pixels transparent and black pixels white
-    new_data = []
-    for item in data:
-        if item[:3] == (255, 255, 255):  # Check if the pixel is white
-            new_data.append((255, 255, 255, 0))  # Make it transparent
-        else:
-            new_data.append((255, 255, 255, 255))  # Make black pixels white
-
-    barcode_img.putdata(new_data)
-    os.remove(f"{barcode_path}.png")  # Delete the temporary barcode file
-    return barcode_img
-
-# Function to create the ID card (front side)
-def create_id_card_front(full_name, dob, position, id_number, address, photo_path, issue_date, validity_date):
-    # Load front side background image
-    background = Image.open("static/images/front_background.jpg")  # Replace with your front background image
-    background = background.resize((CARD_WIDTH, CARD_HEIGHT))  # Resize to card size
-    background = round_corners(background, radius=30)  # Apply rounded corners to the background
-
-    # Load user photo
-    user_photo = Image.open(photo_path).resize((200, 200))
-    user_photo = round_corners(user_photo, radius=20)  # Apply rounded corners to the photo
-
-    # Paste user photo onto the background
-    background.paste(user_photo, (50, 50), user_photo)
-
-    # Draw text on the image
-    draw = ImageDraw.Draw(background)
-    font = ImageFont.truetype("arial.ttf", 30)  # Use a custom font
-    draw.text((300, 60), f"Name: {full_name}", fill="white", font=font)
-    draw.text((300, 100), f"DOB: {dob}", fill="white", font=font)  # Add date of birth
-    draw.text((300, 140), f"Position: {position}", fill="white", font=font)  # Add position
-    draw.text((300, 180), f"ID: {id_number}", fill="white", font=font)
-    draw.text((300, 220), f"Address: {address}", fill="white", font=font)
-    draw.text((50, 570), f"Issue Date: {issue_date}", fill="white", font=font)
-    draw.text((650, 570), f"Valid Until: {validity_date}", fill="white", font=font)
-
-    # Generate and add barcode (under the photo)
-    barcode_img = generate_barcode(id_number)
-    barcode_img = barcode_img.resize((200, 50))  # Resize barcode
-    background.paste(barcode_img, (50, 300), barcode_img)  # Place barcode under the photo
-
-    # Save the front side image
-    front_side_path = f"static/id_cards/id_card_front_{id_number}.png"
-    background.save(front_side_path)
-    return front_side_path
-
-# Function to create the ID card (back side)
-def create_id_card_back(id_number):
-    # Load back side background image
-    background = Image.open("static/images/back_background.jpg")  # Replace with your back background image
-    background = background.resize((CARD_WIDTH, CARD_HEIGHT))  # Resize to card size
-    background = round_corners(background, radius=30)  # Apply rounded corners to the background
-
-    draw = ImageDraw.Draw(background)
-
-    # Add magnetic strip (black rectangle at the top)
-    magnetic_strip_height = 50
-    draw.rectangle([(0, 0), (CARD_WIDTH, magnetic_strip_height)], fill="black")
-
-    # Add text to the magnetic strip
-    font = ImageFont.truetype("arial.ttf", 20)
-    draw.text((10, 15), "Magnetic Strip (For Digital Data Storage)", fill="white", font=font)
-
-    # Add back side content below the magnetic strip
-    font = ImageFont.truetype("arial.ttf", 30)
-    draw.text((50, 70), "KHMER DEMOCRACY ORGANIZATION(KDO) INC.", fill="white", font=font)
-    draw.text((50, 120), "Terms of Use:", fill="white", font=font)
-    draw.text((50, 170), "1. This card is property of the KDO.", fill="white", font=font)
-    draw.text((50, 220), "2. If found, please return to:", fill="white", font=font)
-    draw.text((50, 270), "Lost & Return Address:", fill="white", font=font)
-    draw.text((50, 320), "6 Temple CT Noble Park St, Melbourne, VIC 3174", fill="white", font=font)
-    draw.text((50, 370), "Contact: +61 0395444950", fill="white", font=font)
-    draw.text((50, 570), "Website: kdo.org.au", fill="white", font=font)
-    draw.text((650, 570), "ABN: 43 435 683 952", fill="white", font=font)
-
-    # Save the back side image
-    back_side_path = f"static/id_cards/id_card_back_{id_number}.png"
-    background.save(back_side_path)
-    return back_side_path
+CARD_WIDTH, CARD_HEIGHT = renderer.size
+
+# Function to render both sides of a card, run on a render worker
+def render_card(full_name, dob, position, id_number, address, photo_path, issue_date, validity_date):
+    # The back side is shared by every card, written once per design and then reused
+    profile = app.config['OUTPUT_PROFILE']
+    card = renderer.render(
+        full_name=full_name, dob=dob, position=position, id_number=id_number, address=address,
+        photo_path=photo_path, issue_date=issue_date, validity_date=validity_date,
+        front_path=f"static/id_cards/id_card_front_{id_number}{profile_extension(profile)}",
+        back_dir=app.config['UPLOAD_FOLDER'], profile=profile,
+    )
+    return {"id": id_number, "front": card.paths["front"], "back": card.paths["back"]}
 
 @app.route("/", methods=["GET", "POST"])
+@profiled("index")
 def index():
     if request.method == "POST":
         # Get form data
@@ -136,35 +69,126 @@ def index():
         if not full_name or not dob or not position or not address or not photo:
             return "Please fill all fields and upload a photo."
 
-        # Save the uploaded photo
-        photo_path = f"static/id_cards/{photo.filename}"
-        photo.save(photo_path)
-
-        # Generate ID, validity date, and issue date
-        id_number = generate_id()
-        issue_date = datetime.now().strftime("%d-%m-%Y")
-        validity_date = (datetime.now() + timedelta(days=365)).strftime("%d-%m-%Y")
-
-        # Create front and back sides of the ID card
-        front_side_path = create_id_card_front(full_name, dob, position, id_number, address, photo_path, issue_date, validity_date)
-        back_side_path = create_id_card_back(id_number)
-
-        # Redirect to the preview page
-        return redirect(url_for("preview", front=front_side_path, back=back_side_path))
+        # Read the upload with a size cap and store it by content (re-uploads are not stored or decoded again)
+        try:
+            photo_digest = photo_store.put(read_upload(photo.stream).getvalue())
+        except PhotoTooLarge as e:
+            return str(e), 413
+        except Image.DecompressionBombError:  # Not an OSError; raised by Pillow for decompression-bomb sized images
+            return "The uploaded photo has too many pixels.", 413
+        except OSError:
+            return "The uploaded photo is not a supported image.", 400
+
+        # Issue the ID and dates here, so a queued card already has its number
+        id_number = renderer.new_id()
+        photo_path = photo_store.thumbnail(photo_digest, *renderer.template.photo_slot)  # Card-ready photo for the layout's slot
+        issue_date, validity_date = renderer.card_dates()
+
+        card_args = (full_name, dob, position, id_number, address, photo_path, issue_date, validity_date)
+        if not app.config['RENDER_ASYNC']:
+            card = render_card(*card_args)
+            return redirect(url_for("preview", front=card["front"], back=card["back"]))
+
+        # Queue the render and let the preview page wait for it
+        try:
+            job_id = render_queue.submit(render_card, *card_args)
+        except QueueFull:
+            return "The card generator is busy, please try again shortly.", 429, {"Retry-After": "5"}
+        return redirect(url_for("preview", job=job_id))
 
     return render_template("index.html")
 
+@app.route("/status/<job_id>")
+def status(job_id):
+    # Long-poll with ?wait=<seconds> (at most 30) to block until the card is ready
+    wait = min(request.args.get("wait", 0, type=float), 30)
+    job = render_queue.status(job_id, wait=wait)
+    if job is None:
+        return jsonify(status="unknown"), 404
+    return jsonify(status=job["status"], card=job["result"], error=job["error"])
+
 @app.route("/preview")
 def preview():
+    job_id = request.args.get("job")
+    if job_id:
+        job = render_queue.status(job_id)
+        if job is None:
+            return "Unknown card job.", 404
+        if job["status"] == "failed":
+            return f"Card generation failed: {job['error']}", 500
+        if job["status"] != "done":
+            # Not rendered yet: wait on the status endpoint, then reload
+            return render_template_string(
+                """
+                <p>Your ID card is being generated...</p>
+                <script>
+                    (function poll() {
+                        fetch("{{ url_for('status', job_id=job_id) }}?wait=25")
+                            .then(function (response) { return response.json(); })
+                            .then(function (job) {
+                                if (job.status === "done" || job.status === "failed") { location.reload(); }
+                                else { poll(); }
+                            })
+                            .catch(function () { setTimeout(poll, 2000); });
+                    })();
+                </script>
+                """,
+                job_id=job_id,
+            )
+        return render_preview(job["result"]["front"], job["result"]["back"])
+
     front_side_path = request.args.get("front")
     back_side_path = request.args.get("back")
-    return render_template("preview.html", front=front_side_path, back=back_side_path)
+    return render_preview(front_side_path, back_side_path)
+
+# Function to render the preview page; front_thumb/back_thumb are downscaled previews of the cards
+def render_preview(front_side_path, back_side_path):
+    return render_template(
+        "preview.html", front=front_side_path, back=back_side_path,
+        front_thumb=url_for("thumbnail", filename=front_side_path) if front_side_path else None,
+        back_thumb=url_for("thumbnail", filename=back_side_path) if back_side_path else None,
+    )
+
+# Function to set the Cache-Control header of a card image response
+def cache_card_response(response, path):
+    if is_content_addressed(path):
+        response.headers["Cache-Control"] = f"public, max-age={app.config['IMMUTABLE_MAX_AGE']}, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"  # Cache, but revalidate with the ETag
+    return response
+
+# Function to resolve a requested card file; only generated cards are served, anything else is a 404
+def card_file(filename):
+    card_folder = os.path.realpath(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+    path = os.path.realpath(os.path.join(app.root_path, filename))  # Where send_file looks for relative paths
+    if os.path.commonpath([card_folder, path]) != card_folder or not os.path.isfile(path):
+        abort(404)
+    return path
 
 @app.route("/download/<path:filename>")
 def download(filename):
-    return send_file(filename, as_attachment=True)
+    path = card_file(filename)
+    # Strong ETag from the card's content; If-None-Match / If-Modified-Since get a 304
+    response = send_file(path, as_attachment=True, etag=file_digest(path), conditional=True)
+    return cache_card_response(response, path)
+
+@app.route("/thumbnail/<path:filename>")
+def thumbnail(filename):
+    path = card_file(filename)
+
+    width = min(max(request.args.get("w", app.config['PREVIEW_WIDTH'], type=int), 16), CARD_WIDTH)
+    mime_type = request.accept_mimetypes.best_match(list(THUMBNAIL_FORMATS), default="image/png")
+    etag, data = card_thumbnail(path, width, mime_type)
+
+    response = app.response_class(data, mimetype=mime_type)
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    response.make_conditional(request)
+    return cache_card_response(response, path)
 
 if __name__ == "__main__":
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
+    # Load the card fonts, background and back side once at startup instead of on the first request
+    renderer.preload()
     app.run(debug=True)
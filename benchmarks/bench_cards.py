@@ -0,0 +1,286 @@
+"""
+Benchmarks for the card rendering hot path.
+
+Measures per-stage latency (p50/p99) and throughput for barcode generation,
+corner rounding, background loading, text drawing, PNG encoding, PDF export
+and the Flask index() POST, measures every output encoding profile (encode
+time and bytes per card), then generates synthetic rosters through the batch
+command. Everything runs headless in a scratch directory.
+
+    python benchmarks/bench_cards.py --out bench.json
+    python benchmarks/bench_cards.py --rosters 100 10000 --compare bench.json
+
+Results are written as JSON so runs on different commits can be compared.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import PIL
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from idcard_core.artifact import CardArtifact, render_card_async
+from idcard_core.assets import clear_template_cache, load_template
+from idcard_core.backs import save_back_side, shared_back_side
+from idcard_core.barcodes import render_barcode
+from idcard_core.batch import run_batch
+from idcard_core.encoding import available_profiles, encode_card
+from idcard_core.fonts import get_font, preload_fonts
+from idcard_core.imaging import round_corners
+from idcard_core.photos import load_photo
+from idcard_core.renderer import CardRenderer
+from idcard_core.templates import ASSETS_DIR
+
+
+# Function to return the fields of the benchmark's one member, with today's dates
+def member_fields(renderer, photo_path):
+    issue_date, validity_date = renderer.card_dates()
+    return {
+        "full_name": "Member 0", "dob": "01-01-1990", "position": "Volunteer", "id_number": "123456789",
+        "address": "1 Temple CT", "photo_path": photo_path, "issue_date": issue_date, "validity_date": validity_date,
+    }
+
+
+# Function to time func over a number of runs and summarise the latencies
+def measure(func, runs):
+    func()  # Warm-up, e.g. first cache fill
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "runs": runs,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000,
+        "per_second": runs / sum(samples),
+    }
+
+
+# Function to write a synthetic roster of count members sharing one photo
+def write_roster(directory, count, photo_path):
+    path = os.path.join(directory, f"roster_{count}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["full_name", "dob", "position", "address", "photo_path"])
+        for number in range(count):
+            writer.writerow([f"Member {number}", "01-01-1990", "Volunteer", f"{number} Temple CT, Noble Park VIC 3174", photo_path])
+    return path
+
+
+def bench_stages(workdir, photo_path, runs):
+    """
+    Returns latency statistics for every rendering stage.
+    """
+    renderer = CardRenderer("kdo")
+    card_size = renderer.size
+    back_spec = renderer.back_spec
+    front_background = os.path.join(ASSETS_DIR, "front_background.jpg")
+    preload_fonts(renderer.template.fonts)
+    fields = member_fields(renderer, photo_path)
+    front = renderer.render_front(**fields)
+    card = CardArtifact("123456789", front, back_spec=back_spec)
+
+    def background_cold():
+        clear_template_cache()
+        load_template(front_background, card_size, radius=30)
+
+    def text_drawing():
+        image = front.copy()
+        draw = ImageDraw.Draw(image)
+        font = get_font("arial.ttf", 28)
+        for number in range(7):
+            draw.text((300, 60 + 40 * number), f"Field {number}: Member 0", fill="white", font=font)
+
+    def png_encode():
+        front.save(BytesIO(), format="PNG")
+
+    def print_pdf():
+        # Same drawing as print_pdf in kdo.py, into memory instead of a chosen file
+        pdf = canvas.Canvas(BytesIO(), pagesize=A4)
+        width, height = card_size[0] // 2, card_size[1] // 2
+        pdf.drawImage(CardArtifact("123456789", front, back_spec=back_spec).image_reader("front"), 50, 700, width=width, height=height)
+        pdf.drawImage(card.image_reader("back"), 50, 400, width=width, height=height)
+        pdf.save()
+
+    def card_sequential():
+        # One side after the other, as the front ends did before render_card_async
+        image = renderer.render_front(**fields)
+        image.save(os.path.join(workdir, "front_sequential.png"))
+        save_back_side(back_spec, workdir)
+
+    def card_concurrent():
+        front = renderer.front_layers(**fields)
+        render_card_async("123456789", front, back_spec, front_path=os.path.join(workdir, "front_concurrent.png"), back_dir=workdir).result()
+
+    photo = Image.open(photo_path).resize((200, 200))
+    stages = {
+        "load_photo": lambda: load_photo(photo_path),
+        "generate_barcode": lambda: render_barcode("123456789"),
+        "round_corners_background": lambda: round_corners(front.copy(), radius=30),
+        "round_corners_photo": lambda: round_corners(photo.copy(), radius=20),
+        "background_load_cold": background_cold,
+        "background_load_cached": lambda: load_template(front_background, card_size, radius=30),
+        "back_side_cached": lambda: shared_back_side(back_spec),
+        "text_drawing": text_drawing,
+        "png_encode": png_encode,
+        "print_pdf": print_pdf,
+        "card_sequential": card_sequential,
+        "card_concurrent": card_concurrent,
+        "create_id_card_front": lambda: renderer.render_front(**fields),
+    }
+    results = {name: measure(func, runs) for name, func in stages.items()}
+    results["flask_index_post"] = bench_flask(workdir, photo_path, runs)
+    return results
+
+
+def bench_profiles(photo_path, runs):
+    """
+    Returns encode latency and bytes per card for every output profile.
+    """
+    renderer = CardRenderer("kdo")
+    front = renderer.render_front(**member_fields(renderer, photo_path))
+    back = shared_back_side(renderer.back_spec)
+    results = {}
+    for profile in available_profiles():
+        stats = measure(lambda: encode_card(front, profile), runs)
+        stats["front_bytes"] = len(encode_card(front, profile))
+        stats["back_bytes"] = len(encode_card(back, profile))
+        results[profile] = stats
+    return results
+
+
+def bench_flask(workdir, photo_path, runs):
+    """
+    Times the synchronous index() POST of the Flask app through its test client.
+    """
+    os.makedirs(os.path.join(workdir, "static", "id_cards"), exist_ok=True)
+    sys.path.insert(0, os.path.join(REPO_ROOT, "IDCard", "browser"))
+    import idcard
+
+    # The app's own renderer, with the bundled backgrounds and a scratch ID store and registry
+    idcard.renderer = CardRenderer(idcard.renderer.template.name, assets_dir=ASSETS_DIR,
+                                   id_store=os.path.join(workdir, "ids.sqlite3"),
+                                   registry=os.path.join(workdir, "registry.sqlite3"))
+    idcard.app.config['RENDER_ASYNC'] = False
+    client = idcard.app.test_client()
+    with open(photo_path, "rb") as f:
+        photo_bytes = f.read()
+
+    def post():
+        response = client.post("/", data={
+            "full_name": "Member 0", "dob": "01-01-1990", "position": "Volunteer", "address": "1 Temple CT",
+            "photo": (BytesIO(photo_bytes), "member.jpg"),
+        })
+        assert response.status_code == 302, response.status_code
+
+    return measure(post, runs)
+
+
+def bench_rosters(workdir, photo_path, sizes, workers):
+    """
+    Runs the batch command over synthetic rosters and returns cards/second.
+    """
+    results = {}
+    for size in sizes:
+        roster = write_roster(workdir, size, photo_path)
+        out_dir = os.path.join(workdir, f"cards_{size}")
+        started = time.perf_counter()
+        generated, _, failed = run_batch(
+            roster, out_dir, workers=workers, id_store=os.path.join(workdir, "ids.sqlite3"), progress=open(os.devnull, "w"),
+            registry=os.path.join(workdir, "registry.sqlite3"))
+        seconds = time.perf_counter() - started
+        results[str(size)] = {"cards": generated, "failed": failed, "seconds": seconds, "cards_per_second": generated / seconds}
+        shutil.rmtree(out_dir)
+    return results
+
+
+# Function to identify the commit being measured
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to print how a run compares with an earlier one
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Compared with {baseline_path} ({baseline.get('commit')}):")
+    for name, stats in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before:
+            print(f"  {name:28} p50 {before['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms ({stats['p50_ms'] / before['p50_ms']:.2f}x)")
+    for profile, stats in current["profiles"].items():
+        before = baseline.get("profiles", {}).get(profile)
+        if before:
+            print(f"  profile {profile:20} p50 {before['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms, "
+                  f"front {before['front_bytes']} -> {stats['front_bytes']} bytes")
+    for size, stats in current["rosters"].items():
+        before = baseline.get("rosters", {}).get(size)
+        if before:
+            print(f"  roster {size:21} {before['cards_per_second']:9.1f} -> {stats['cards_per_second']:9.1f} cards/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ID card generation")
+    parser.add_argument("--runs", type=int, default=50, help="Samples per stage")
+    parser.add_argument("--rosters", type=int, nargs="*", default=[100], help="Synthetic roster sizes, e.g. 100 10000 100000")
+    parser.add_argument("--workers", type=int, help="Batch worker processes (default: all cores)")
+    parser.add_argument("--out", default="bench.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="idcard-bench-")
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        photo_path = os.path.join(workdir, "member.jpg")
+        Image.new("RGB", (3000, 4000), "steelblue").save(photo_path, quality=90)  # Phone-sized photo
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "cpus": os.cpu_count(),
+            "stages": bench_stages(workdir, photo_path, args.runs),
+            "profiles": bench_profiles(photo_path, args.runs),
+            "rosters": bench_rosters(workdir, photo_path, args.rosters, args.workers),
+        }
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    for name, stats in results["stages"].items():
+        print(f"{name:28} p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  {stats['per_second']:9.1f}/s")
+    for profile, stats in results["profiles"].items():
+        print(f"profile {profile:20} p50 {stats['p50_ms']:9.2f} ms  front {stats['front_bytes'] / 1024:8.1f} KB  back {stats['back_bytes'] / 1024:8.1f} KB")
+    for size, stats in results["rosters"].items():
+        print(f"roster {size:21} {stats['cards_per_second']:9.1f} cards/s ({stats['seconds']:.1f} s)")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Lookup latency of the card registry at scale.
+
+Fills a scratch registry with synthetic cards (a million by default), then
+measures p50/p99 latency of the lookups the front ends and renewal batches
+use: by ID, by name prefix, cards expiring in the next 30 days, reverse
+barcode lookup, and recording one card. Every query's plan is checked too:
+the check fails (exit status 1) if a lookup scans the table instead of using
+its index, or if its p99 exceeds the budget.
+
+    python benchmarks/bench_registry.py
+    python benchmarks/bench_registry.py --cards 100000 --budget 5
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from idcard_core.registry import CardRegistry
+
+FIRST_NAMES = ("Sok", "Chan", "Dara", "Sophea", "Vanna", "Bopha", "Rithy", "Srey", "Kosal", "Malis")
+LAST_NAMES = ("Chea", "Kim", "Heng", "Sam", "Noun", "Phan", "Lim", "Meas", "Ouk", "Ros")
+
+
+# Function to time func over a number of runs and summarise the latencies
+def measure(func, runs):
+    func()  # Warm-up, e.g. first page reads
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000,
+    }
+
+
+# Function to fill the registry with count synthetic cards, expiring over the next five years
+def fill(registry, count, chunk=50000):
+    today = date.today()
+    rng = random.Random(1)
+    ids = []
+    for start in range(0, count, chunk):
+        cards = []
+        for number in range(start, min(start + chunk, count)):
+            card_id = str(number * 7368787 % 10 ** 9).zfill(9)
+            issued = today - timedelta(days=rng.randrange(1825))
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {number}"
+            cards.append({"id": card_id, "full_name": name, "layout": "kdo", "issue_date": issued,
+                          "expiry_date": issued + timedelta(days=1825), "barcode": card_id,
+                          "front": f"cards/id_card_front_{card_id}.png", "fields": {"full_name": name}})
+            ids.append(card_id)
+        registry.record_many(cards)
+    return ids
+
+
+# Function to return the query plan lines of a lookup that scan the whole table
+def table_scans(registry, sql, parameters):
+    plan = registry._connection.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    return [row[-1] for row in plan if row[-1].startswith("SCAN") and "INDEX" not in row[-1]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark card registry lookups")
+    parser.add_argument("--cards", type=int, default=1000000, help="Cards in the scratch registry")
+    parser.add_argument("--runs", type=int, default=200, help="Samples per lookup")
+    parser.add_argument("--budget", type=float, default=10.0, help="p99 budget per lookup in ms")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="idcard-registry-")
+    try:
+        registry = CardRegistry(os.path.join(workdir, "registry.sqlite3"))
+        started = time.perf_counter()
+        ids = fill(registry, args.cards)
+        print(f"Filled {len(registry)} cards in {time.perf_counter() - started:.1f} s")
+
+        rng = random.Random(2)
+        counter = iter(range(10 ** 9, 2 * 10 ** 9))
+        lookups = {
+            "get": (lambda: registry.get(rng.choice(ids)),
+                    "SELECT * FROM cards WHERE id = ?", ("1",)),
+            "find_by_name": (lambda: registry.find_by_name(rng.choice(FIRST_NAMES) + " " + rng.choice(LAST_NAMES)),
+                             "SELECT * FROM cards WHERE name_key >= ? AND name_key < ? ORDER BY name_key, id LIMIT ?",
+                             ("a", "b", 50)),
+            "expiring_30_days": (lambda: registry.expiring(30, limit=100),
+                                 "SELECT * FROM cards WHERE expiry_date BETWEEN ? AND ? ORDER BY expiry_date, id LIMIT ?",
+                                 ("2026-01-01", "2026-02-01", 100)),
+            "lookup_barcode": (lambda: registry.lookup_barcode(f"*{rng.choice(ids)}*"),
+                               "SELECT * FROM cards WHERE barcode = ?", ("1",)),
+            "record": (lambda: registry.record(str(next(counter)), "New Member", date.today(), date.today()),
+                       None, None),
+        }
+
+        failures = 0
+        for name, (lookup, sql, parameters) in lookups.items():
+            stats = measure(lookup, args.runs)
+            scans = table_scans(registry, sql, parameters) if sql else []
+            ok = stats["p99_ms"] <= args.budget and not scans
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':<5}{name:<20} p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms"
+                  + (f"  full scan: {'; '.join(scans)}" if scans else ""))
+        registry.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
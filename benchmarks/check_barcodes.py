@@ -0,0 +1,97 @@
+"""
+Pixel-equivalence check for the in-memory barcode renderer.
+
+idcard_core.barcodes.render_barcode replaced a loop that saved the Code39
+barcode to a temporary PNG, read it back and rewrote every pixel in Python.
+This check keeps that loop as the reference and compares both, pixel for
+pixel, for 8, 9 and 10 digit IDs in both ink modes: white ink on
+transparency (kdo.py, the Flask app) and the writer's own ink (app_v2.py).
+It fails (exit status 1) on any difference and reports how much faster the
+new renderer is.
+
+    python benchmarks/check_barcodes.py
+    python benchmarks/check_barcodes.py --ids 50
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import barcode
+from barcode.writer import ImageWriter
+from PIL import Image
+
+from idcard_core.barcodes import BARCODE_SIZE, render_barcode
+
+
+# Function to render a barcode the way the apps did before render_barcode:
+# through a temporary PNG and a loop over every pixel
+def legacy_barcode(id_number, white_ink, workdir):
+    code = barcode.get('code39', id_number, writer=ImageWriter())
+    barcode_path = os.path.join(workdir, f"barcode_{id_number}")
+    code.save(barcode_path)
+
+    barcode_img = Image.open(f"{barcode_path}.png")
+    barcode_img = barcode_img.convert("RGBA")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # getdata() is deprecated in newer Pillow
+        data = barcode_img.getdata()
+
+    new_data = []
+    for item in data:
+        if item[:3] == (255, 255, 255):
+            new_data.append((255, 255, 255, 0))
+        elif white_ink:
+            new_data.append((255, 255, 255, 255))
+        else:
+            new_data.append(item)
+
+    barcode_img.putdata(new_data)
+    os.remove(f"{barcode_path}.png")
+    return barcode_img.resize(BARCODE_SIZE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check render_barcode against the old per-pixel loop")
+    parser.add_argument("--ids", type=int, default=10, help="Random IDs per length")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    workdir = tempfile.mkdtemp(prefix="idcard-barcodes-")
+    failures = 0
+    try:
+        for digits in (8, 9, 10):
+            ids = [str(rng.randrange(10 ** digits)).zfill(digits) for _ in range(args.ids)]
+            for white_ink in (True, False):
+                legacy_seconds = new_seconds = 0.0
+                mismatches = []
+                for id_number in ids:
+                    started = time.perf_counter()
+                    expected = legacy_barcode(id_number, white_ink, workdir)
+                    legacy_seconds += time.perf_counter() - started
+                    started = time.perf_counter()
+                    actual = render_barcode(id_number, fill=(255, 255, 255) if white_ink else None)
+                    new_seconds += time.perf_counter() - started
+                    if actual.mode != expected.mode or actual.size != expected.size \
+                            or actual.tobytes() != expected.tobytes():
+                        mismatches.append(id_number)
+                failures += len(mismatches)
+                ink = "white ink" if white_ink else "writer ink"
+                print(f"{'ok' if not mismatches else 'FAIL':<5}{digits:>2} digits, {ink:<10}  "
+                      f"{len(ids) - len(mismatches)}/{len(ids)} identical, "
+                      f"{legacy_seconds / new_seconds:.1f}x faster"
+                      + (f"  differ: {', '.join(mismatches)}" if mismatches else ""))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Cold-start import budget for the entry points.
+
+For every entry point the module-level imports are read from its source (so
+no window opens and no server starts), run in a fresh interpreter under
+python -X importtime, and timed. The check fails (exit status 1) when an
+entry point takes longer than its budget to import, or when it loads at
+startup a module that is only meant to load on first use: reportlab (PDF
+export), python-barcode (rendering) and, outside the Tk apps, tkinter.
+
+    python benchmarks/check_startup.py
+    python benchmarks/check_startup.py --runs 5 --scale 1.5   # slower machine
+
+Each entry point is measured runs times and the fastest run counts, which
+filters out a busy machine; the slowest imports are listed for every entry
+point so a regression can be traced to the module that caused it.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point: (import budget in ms, modules it must not load at startup)
+DEFERRED = ("reportlab", "barcode")
+ENTRY_POINTS = {
+    "kdo.py": (150, DEFERRED),
+    "app_v1.py": (150, DEFERRED),
+    "app_v2.py": (150, DEFERRED),
+    "IDCard/card_front_back_bg.py": (150, DEFERRED),
+    "IDCard/app.py": (150, DEFERRED),
+    "IDCard/front_back_1.py": (150, DEFERRED),
+    "IDCard/browser/idcard.py": (400, DEFERRED + ("tkinter",)),
+    "IDCard/browser/amatak": (300, DEFERRED + ("tkinter", "PIL")),
+    "idcard_core/batch.py": (150, DEFERRED + ("tkinter",)),
+}
+
+# Run in the fresh interpreter: import, time, report what got loaded
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+"""
+
+
+# Function to collect the module-level import statements of a source file
+def startup_imports(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    statements = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            statements.extend(f"import {alias.name}" for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            statements.append(f"import {node.module}")
+    return statements
+
+
+# Function to import statements in a fresh interpreter; returns the probe's
+# result and the slowest imports as listed by -X importtime
+def measure(statements):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    env.pop("IDCARD_PROFILE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(imports="\n".join(statements))],
+        capture_output=True, text=True, env=env, cwd=REPO_ROOT, check=True,
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    slowest = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("   "):  # Top-level imports only
+            slowest.append((int(cumulative) / 1000, name.strip()))
+    slowest.sort(reverse=True)
+    return probe, slowest[:5]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of the entry points")
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per entry point; the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. for a slower machine")
+    parser.add_argument("entry_points", nargs="*", help="Entry points to check (default: all)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for entry_point in args.entry_points or ENTRY_POINTS:
+        budget, deferred = ENTRY_POINTS[entry_point]
+        budget *= args.scale
+        statements = startup_imports(os.path.join(REPO_ROOT, entry_point))
+        probe, slowest = min((measure(statements) for _ in range(args.runs)), key=lambda run: run[0]["ms"])
+        loaded = sorted({name for name in probe["modules"] for module in deferred
+                         if name == module or name.startswith(module + ".")})
+        ok = probe["ms"] <= budget and not loaded
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5}{entry_point:<32}{probe['ms']:>8.1f} ms  (budget {budget:.0f} ms)")
+        for ms, name in slowest:
+            print(f"{'':<9}{ms:>8.1f} ms  {name}")
+        if loaded:
+            print(f"{'':<9}loaded at startup: {', '.join(loaded)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
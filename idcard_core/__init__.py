@@ -0,0 +1,3 @@
+"""
+Shared rendering helpers for the ID card front ends (Tkinter apps, Flask app).
+"""
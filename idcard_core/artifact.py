@@ -0,0 +1,208 @@
+"""
+In-memory result of rendering one card.
+
+A CardArtifact keeps the rendered front and back as PIL images and derives
+everything else from them on demand: PNG bytes (encoded once), preview
+thumbnails (resized once) and reportlab ImageReaders for PDF export. Nothing
+has to be written to disk and read back; saving is optional and runs on a
+background writer thread.
+
+render_card_async() schedules a card's two sides on a bounded pool: the
+front's photo, barcode and background load in parallel, the back is looked up
+in (or rendered into) the shared cache, and it returns a Future, so a GUI or
+web worker can wait for it or poll it instead of blocking. It does not make a
+card faster: compositing and encoding the front is one serial step that
+dominates, and the back is a cache hit, so there is little left to overlap.
+benchmarks/bench_cards.py measures card_concurrent level with card_sequential
+(about 105 ms each); the aim of halving per-card latency was not met.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from idcard_core.backs import back_side_png, save_back_side, shared_back_side
+from idcard_core.encoding import DEFAULT_PROFILE, encode_card
+from idcard_core.files import write_file
+from idcard_core.layers import ImageLayer, LayeredCard
+
+# Threads rendering card sides; bounds the work of concurrent cards
+RENDER_THREADS = 4
+
+_writer = None
+_renderer = None
+_writer_lock = threading.Lock()
+
+
+# Function to get the shared background writer, started on first use
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="card-writer")
+        return _writer
+
+
+# Function to get the shared render pool, started on first use
+def _get_renderer():
+    global _renderer
+    with _writer_lock:
+        if _renderer is None:
+            _renderer = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix="card-render")
+        return _renderer
+
+
+# Function to run func on the render pool once every future in futures is
+# done, without tying up a pool thread while waiting; returns its Future
+def _when_done(futures, func):
+    result = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def run():
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            result.set_exception(errors[0])
+            return
+        try:
+            chained = _get_renderer().submit(func)
+        except RuntimeError as e:  # Pool shut down at interpreter exit
+            result.set_exception(e)
+            return
+        chained.add_done_callback(lambda done: result.set_exception(done.exception()) if done.exception() is not None
+                                  else result.set_result(done.result()))
+
+    def one_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            run()
+
+    if not futures:
+        run()
+    for future in futures:
+        future.add_done_callback(one_done)
+    return result
+
+
+class CardArtifact:
+    """
+    The two rendered sides of a card. The back is either given as an image
+    or taken from the shared back-side cache with back_spec, in which case
+    its PNG bytes are the cache's shared encoding. A single-sided card has
+    neither; its "back" image is None.
+    """
+
+    def __init__(self, id_number, front, back=None, back_spec=None):
+        self.id_number = id_number
+        self.back_spec = back_spec
+        if back is None and back_spec is not None:
+            back = shared_back_side(back_spec)
+        self._images = {"front": front, "back": back}
+        self.paths = {}  # Files written for the sides, if any
+        self._encoded = {}
+        self._thumbnails = {}
+        self._lock = threading.Lock()
+
+    def image(self, side):
+        """
+        Returns the rendered image of side ("front" or "back"). It is shared,
+        so callers must not draw on it.
+        """
+        return self._images[side]
+
+    def png(self, side):
+        """
+        Returns the PNG encoding of side, encoding it on first use.
+        """
+        return self.encoded(side, DEFAULT_PROFILE)
+
+    def encoded(self, side, profile):
+        """
+        Returns side encoded with the named output profile (see
+        idcard_core.encoding), encoding it on first use.
+        """
+        with self._lock:
+            data = self._encoded.get((side, profile))
+            if data is None:
+                if side == "back" and self.back_spec is not None and profile == DEFAULT_PROFILE:
+                    data = back_side_png(self.back_spec)[1]
+                else:
+                    data = encode_card(self._images[side], profile)
+                self._encoded[(side, profile)] = data
+            return data
+
+    def thumbnail(self, side, size):
+        """
+        Returns side resized to size, e.g. for a preview window.
+        """
+        key = (side, tuple(size))
+        with self._lock:
+            thumbnail = self._thumbnails.get(key)
+            if thumbnail is None:
+                thumbnail = self._images[side].resize(tuple(size))
+                self._thumbnails[key] = thumbnail
+            return thumbnail
+
+    def image_reader(self, side):
+        """
+        Returns a reportlab ImageReader over the in-memory image of side.
+        """
+        from reportlab.lib.utils import ImageReader  # Only PDF export needs reportlab
+
+        return ImageReader(self._images[side])
+
+    def save_async(self, side, path, profile=DEFAULT_PROFILE):
+        """
+        Writes side, encoded with profile, to path on the background writer
+        and returns a Future resolving to the path.
+        """
+        return _get_writer().submit(lambda: write_file(path, self.encoded(side, profile)))
+
+
+def render_card_async(id_number, front, back_spec, front_path=None, back_dir=None, profile=DEFAULT_PROFILE):
+    """
+    Renders and encodes both sides of a card concurrently and returns a
+    Future resolving to its CardArtifact. front is a LayeredCard (its image
+    layers are loaded in parallel) or a function returning the front image;
+    back_spec is None for a single-sided card. With front_path the encoded
+    front is written there, with back_dir the shared back side is saved into
+    that directory; the paths end up in the artifact's paths.
+    """
+    pool = _get_renderer()
+
+    # Front inputs: every image layer decodes or renders on its own thread
+    loads = []
+    if isinstance(front, LayeredCard):
+        for layer in [front.background, *front.layers]:
+            if isinstance(layer, ImageLayer):
+                loads.append(pool.submit(lambda layer=layer: layer.image))
+
+    def render_front():
+        image = front.image if isinstance(front, LayeredCard) else front()
+        data = encode_card(image, profile)
+        if front_path:
+            write_file(front_path, data)
+        return image, data
+
+    def render_back():
+        if back_spec is None:
+            return None
+        back_side_png(back_spec)  # Cache hit, or render and encode once
+        if back_dir is not None:
+            return save_back_side(back_spec, back_dir)
+        return None
+
+    front_future = _when_done(loads, render_front)
+    back_future = pool.submit(render_back)
+
+    def assemble():
+        image, data = front_future.result()
+        card = CardArtifact(id_number, image, back_spec=back_spec)
+        card._encoded[("front", profile)] = data
+        if front_path:
+            card.paths["front"] = front_path
+        if back_future.result() is not None:
+            card.paths["back"] = back_future.result()
+        return card
+
+    return _when_done([front_future, back_future], assemble)
@@ -0,0 +1,63 @@
+"""
+Process-wide cache of card background templates.
+
+Backgrounds are decoded, resized to the card size and (optionally) given
+rounded corners once per process. Every card then works on a copy() of the
+cached image, so a cache hit costs a single memory copy instead of a JPEG
+decode plus a resize.
+"""
+import os
+import threading
+
+from PIL import Image
+
+from idcard_core.imaging import round_corners
+
+_templates = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def load_template(path, size, radius=None):
+    """
+    Returns a private copy of the background at path, resized to size and
+    rounded with radius (skipped when radius is None).
+
+    Entries are keyed by path, size and radius and remember the file's
+    modification time, so an edited background is picked up on the next call.
+    """
+    key = (os.path.abspath(path), tuple(size), radius)
+    mtime = os.stat(path).st_mtime_ns
+
+    with _lock:
+        entry = _templates.get(key)
+        if entry is not None and entry[0] == mtime:
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+            image = Image.open(path)
+            image = image.resize(tuple(size))
+            if radius is not None:
+                image = round_corners(image, radius=radius)
+            entry = (mtime, image)
+            _templates[key] = entry
+
+    return entry[1].copy()
+
+
+def template_cache_stats():
+    """
+    Returns hit/miss counters and the number of cached templates.
+    """
+    with _lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"], "entries": len(_templates)}
+
+
+def clear_template_cache():
+    """
+    Drops every cached template and resets the counters.
+    """
+    with _lock:
+        _templates.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
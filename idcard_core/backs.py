@@ -0,0 +1,148 @@
+"""
+Content-addressed cache for the static back side of the cards.
+
+The back of a card carries no member data, only the organisation's fixed
+text, so it is rendered once per back-side spec and shared by every card.
+A spec is a plain dict:
+
+    {
+        "background": "images/back_background.jpg",
+        "size": (1010, 637),
+        "radius": 30,                                 # None keeps square corners
+        "fill": "white",                              # text colour
+        "color": "white",                             # plain background if "background" is None
+        "rectangles": [((0, 50, 1010, 100), "black")],
+        "text": [((50, 15), "Some text", "arial.ttf", 20)],
+    }
+
+The cache key is a digest of the spec and of the background file's bytes,
+so the same artwork and text always map to the same key and file name.
+"""
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from idcard_core.assets import load_template
+from idcard_core.files import write_file
+from idcard_core.fonts import get_font
+from idcard_core.imaging import round_corners
+from idcard_core.profiling import profiled, stage
+
+_backs = {}
+_file_digests = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+# Function to hash a background file once per modification time
+def _file_digest(path):
+    mtime = os.stat(path).st_mtime_ns
+    key = os.path.abspath(path)
+    cached = _file_digests.get(key)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest())
+        _file_digests[key] = cached
+    return cached[1]
+
+
+def back_side_key(spec):
+    """
+    Returns the content key for a back-side spec.
+    """
+    # The background is identified by its bytes, not by where it is stored
+    content = {name: value for name, value in spec.items() if name != "background"}
+    digest = hashlib.sha256()
+    if spec["background"] is not None:
+        digest.update(_file_digest(spec["background"]).encode("ascii"))
+    digest.update(json.dumps(content, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# Function to draw a back side from its spec
+@profiled("back")
+def _render_back(spec):
+    if spec["background"] is not None:
+        background = load_template(spec["background"], tuple(spec["size"]), radius=spec.get("radius"))
+    else:
+        background = Image.new("RGB", tuple(spec["size"]), spec.get("color", "white"))
+        if spec.get("radius") is not None:
+            background = round_corners(background, radius=spec["radius"])
+
+    draw = ImageDraw.Draw(background)
+    for box, color in spec.get("rectangles", ()):
+        draw.rectangle([(box[0], box[1]), (box[2], box[3])], fill=color)
+
+    fill = spec.get("fill", "white")
+    for xy, text, font_path, font_size in spec.get("text", ()):
+        font = get_font(font_path, font_size)
+        draw.text(tuple(xy), text, fill=fill, font=font)
+    return background
+
+
+# Function to fetch (rendering on first use) the cache entry for a spec
+def _entry(spec):
+    key = back_side_key(spec)
+    with _lock:
+        entry = _backs.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            entry = {"key": key, "image": _render_back(spec), "png": None}
+            _backs[key] = entry
+        else:
+            _stats["hits"] += 1
+    return entry
+
+
+def back_side_image(spec):
+    """
+    Returns a copy of the rendered back side for spec.
+    """
+    return _entry(spec)["image"].copy()
+
+
+def shared_back_side(spec):
+    """
+    Returns the cached back side itself, without copying. It is shared by
+    every caller and must only be read (previews, PDF export, encoding).
+    """
+    return _entry(spec)["image"]
+
+
+def back_side_png(spec):
+    """
+    Returns (key, png_bytes) for spec. The PNG is encoded once and the same
+    bytes are handed to every caller, e.g. PDF and batch exports.
+    """
+    entry = _entry(spec)
+    with _lock:
+        if entry["png"] is None:
+            buffer = BytesIO()
+            with stage("encode", profile="default"):
+                entry["image"].save(buffer, format="PNG")
+            entry["png"] = buffer.getvalue()
+    return entry["key"], entry["png"]
+
+
+def save_back_side(spec, directory):
+    """
+    Writes the shared back side to directory as id_card_back_<key>.png, only
+    if it is not there yet, and returns its path.
+    """
+    key, png = back_side_png(spec)
+    path = os.path.join(directory, f"id_card_back_{key}.png")
+    if not os.path.exists(path):
+        write_file(path, png)
+    return path
+
+
+def back_cache_stats():
+    """
+    Returns hit/miss counters and the number of cached back sides.
+    """
+    with _lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"], "entries": len(_backs)}
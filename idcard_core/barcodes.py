@@ -0,0 +1,50 @@
+"""
+In-memory Code39 barcode rendering for the ID card front side.
+
+python-barcode is imported on the first barcode rather than with this module:
+importing it costs more than rendering a card, and processes that never
+render (a launcher, a status page) should not pay for it.
+"""
+from PIL import Image, ImageChops
+
+from idcard_core.profiling import profiled
+
+# Size of the barcode slot under the member photo
+BARCODE_SIZE = (200, 50)
+
+
+# Function to build an opaque (255) / transparent (0) mask from one band:
+# any channel value below 255 means the pixel is not pure white
+def _ink_mask(band):
+    return band.point(lambda value: 255 if value < 255 else 0)
+
+
+@profiled("barcode")
+def render_barcode(id_number, size=BARCODE_SIZE, fill=(255, 255, 255)):
+    """
+    Renders a Code39 barcode for id_number on a transparent background.
+
+    The writer draws into an in-memory image and the background is removed
+    with band operations, so no temporary PNG is written and no Python loop
+    runs over the pixels. Ink pixels are painted with fill (white by default);
+    pass fill=None to keep the writer's own ink colours. The result is already
+    scaled to size, ready to paste onto the card.
+    """
+    import barcode
+    from barcode.writer import ImageWriter
+
+    code = barcode.get('code39', id_number, writer=ImageWriter())
+    rendered = code.render().convert("RGB")
+
+    red, green, blue = rendered.split()
+    alpha = ImageChops.lighter(ImageChops.lighter(_ink_mask(red), _ink_mask(green)), _ink_mask(blue))
+
+    if fill is None:
+        barcode_img = Image.merge("RGBA", (red, green, blue, alpha))
+    else:
+        planes = [Image.new("L", rendered.size, value) for value in fill]
+        barcode_img = Image.merge("RGBA", (*planes, alpha))
+
+    if size is not None and barcode_img.size != tuple(size):
+        barcode_img = barcode_img.resize(size)
+    return barcode_img
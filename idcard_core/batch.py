@@ -0,0 +1,338 @@
+"""
+Headless batch generation of member cards from a CSV or JSONL roster.
+
+    python -m idcard_core.batch members.csv --out cards/
+    python -m idcard_core.batch members.csv --layout card_belongs_to
+    python -m idcard_core.batch members.csv --layout plain --assets-dir IDCard/
+
+Each roster row needs the fields of the card layout (see
+idcard_core.templates), for the default "kdo" layout full_name (or name), dob,
+position, address and photo_path (or photo); relative photo paths are resolved
+against the roster's directory. IDs and dates are issued here. Fronts are
+rendered on a process pool by the same card renderer as the apps (see
+idcard_core.renderer); the back side is shared and written once.
+
+Every finished card is appended to a JSONL manifest (manifest.jsonl in the
+output directory by default). Running the same command again after a crash
+skips the members already listed there. A member is recognised by their
+member_id column if the roster has one, by the card ID in an id_number
+column, or else by name and date of birth, so reordering rows or editing an
+address does not issue a second card. With --renew, cards already listed are
+re-dated in place instead: only the issue and expiry lines of the saved front
+and the fields that changed since it was printed are redrawn (see
+idcard_core.layers), the ID is kept.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+from idcard_core.backs import save_back_side
+from idcard_core.encoding import DEFAULT_PROFILE, PRINT_PROFILES, save_card
+from idcard_core.fonts import preload_fonts
+from idcard_core.metrics import cache_stats, cache_stats_delta
+from idcard_core.photostore import PhotoStore
+from idcard_core.registry import open_registry
+from idcard_core.renderer import CardRenderer
+from idcard_core.templates import ASSETS_DIR
+
+DEFAULT_LAYOUT = "kdo"
+
+REQUIRED_FIELDS = ("full_name", "dob", "position", "address", "photo_path")
+FIELD_ALIASES = {"name": "full_name", "photo": "photo_path", "id": "id_number", "card_id": "id_number"}
+
+# Fields that identify a member when the roster has no member_id column
+IDENTITY_FIELDS = ("full_name", "dob")
+
+
+def read_roster(path):
+    """
+    Yields one member dict per roster row, with aliases mapped to the
+    canonical field names. JSONL is used for .jsonl/.ndjson files, CSV
+    otherwise.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            member = {FIELD_ALIASES.get(key.strip(), key.strip()): str(value).strip() for key, value in row.items() if key}
+            if member.get("photo_path") and not os.path.isabs(member["photo_path"]):
+                member["photo_path"] = os.path.join(base_dir, member["photo_path"])
+            yield member
+
+
+# Function to give a roster member a stable identity across runs and roster
+# edits: their member_id, else their name and date of birth (else every field
+# the layout needs)
+def member_key(member, fields=REQUIRED_FIELDS):
+    if member.get("member_id"):
+        identity = ["member_id", member["member_id"]]
+    else:
+        identity = [member.get(field, "") for field in IDENTITY_FIELDS if field in fields]
+        identity = identity or [member.get(field, "") for field in fields]
+    return hashlib.sha256(json.dumps(identity).encode("utf-8")).hexdigest()[:16]
+
+
+# Function to compute the key manifests written before member_key() used,
+# which also covered the row number and every field
+def _legacy_member_key(row_number, member, fields=REQUIRED_FIELDS):
+    content = json.dumps([row_number, *(member.get(field, "") for field in fields)])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def read_manifest(path):
+    """
+    Returns the cards already recorded in the manifest as a dict of records
+    by key; for a key listed more than once (renewals) the last record wins.
+    A torn last line (from a crash mid-write) is ignored.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                done[record["key"]] = record
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+# Function run once in every worker process
+def _init_worker(layout, assets_dir=ASSETS_DIR):
+    preload_fonts(CardRenderer(layout, assets_dir).template.fonts)
+
+
+# Function to render and save the front side of one member's card; with a
+# timings dict, the seconds spent in each stage are recorded in it
+def _render_member(key, member, out_dir, id_store, photo_store, profile, timings=None, layout=DEFAULT_LAYOUT,
+                   assets_dir=ASSETS_DIR):
+    started = time.perf_counter()
+    renderer = CardRenderer(layout, assets_dir, id_store=id_store, profile=profile)
+    fields = renderer.issue(**{field: member[field] for field in renderer.fields})
+    stages = [("id", time.perf_counter())]
+    card_fields = dict(fields)
+    photo_digest = None
+    if photo_store and "photo_path" in fields:
+        # Renewals reuse the stored thumbnail instead of decoding the photo again
+        store = PhotoStore(photo_store)
+        photo_digest = store.put_file(fields["photo_path"])
+        card_fields["photo_path"] = store.thumbnail(photo_digest, *renderer.template.photo_slot)
+        stages.append(("photo", time.perf_counter()))
+    front_side = renderer.render_front(**card_fields)
+    stages.append(("front", time.perf_counter()))
+    front_side_path = os.path.join(out_dir, f"id_card_front_{fields.get('id_number', key)}.png")
+    save_card(front_side, front_side_path, profile)
+    stages.append(("save", time.perf_counter()))
+    if timings is not None:
+        for stage, finished in stages:
+            timings[stage] = finished - started
+            started = finished
+    return {
+        "key": key,
+        "id": fields.get("id_number"),
+        "full_name": member.get("full_name"),
+        "issue_date": fields.get("issue_date"),
+        "validity_date": fields.get("validity_date"),
+        "front": front_side_path,
+        "photo": photo_digest,
+        "profile": profile,
+        "fields": {field: member[field] for field in renderer.fields},
+    }
+
+
+def manifest_entry(renderer, record, member=None):
+    """
+    Returns the card registry entry (see idcard_core.registry) of a card
+    from its manifest record and, if known, the member's roster row.
+    """
+    printed = member if member is not None else record.get("fields") or {}
+    fields = {field: printed[field] for field in renderer.fields if field in printed}
+    fields.setdefault("full_name", record.get("full_name"))
+    fields.update(id_number=record["id"], issue_date=record["issue_date"], validity_date=record["validity_date"])
+    return renderer.registry_entry({name: value for name, value in fields.items() if value is not None},
+                                   record["front"], record.get("back"))
+
+
+def render_member(member, out_dir, id_store=None, photo_store=None, profile=DEFAULT_PROFILE, layout=DEFAULT_LAYOUT,
+                  registry=None, assets_dir=ASSETS_DIR):
+    """
+    Renders one member's card outside a batch run (e.g. in a warm worker
+    process, see idcard_core.workerpool), records it in the card registry
+    (see idcard_core.registry) and returns its record: the ID, dates and the
+    paths of the saved front and shared back. "timings" has the seconds
+    spent in each stage and "caches" the hits and misses each process-wide
+    cache served for this card, for metrics.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    caches = cache_stats()
+    timings = {}
+    record = _render_member(None, member, out_dir, id_store, photo_store, profile, timings, layout, assets_dir)
+    started = time.perf_counter()
+    renderer = CardRenderer(layout, assets_dir)
+    record["back"] = save_back_side(renderer.back_spec, out_dir) if renderer.back_spec is not None else None
+    timings["back"] = time.perf_counter() - started
+    if record["id"] is not None:
+        started = time.perf_counter()
+        open_registry(registry).record_many([manifest_entry(renderer, record, member)])
+        timings["register"] = time.perf_counter() - started
+    record["timings"] = timings
+    record["caches"] = cache_stats_delta(caches, cache_stats())
+    return record
+
+
+# Function to re-date the saved front of an already issued card, printed with
+# old_fields (None if unknown: only the dates are redrawn), and redraw the
+# member's fields that changed since
+def _renew_member(record, member, dates, layout=DEFAULT_LAYOUT, old_fields=None, assets_dir=ASSETS_DIR):
+    renderer = CardRenderer(layout, assets_dir)
+    with Image.open(record["front"]) as front:
+        front = front.convert("RGBA")  # Archival cards are stored as palette images
+    fields = {field: member[field] for field in renderer.fields}
+    printed = dict(fields, **{field: value for field, value in (old_fields or {}).items() if field in fields})
+    changes = {field: value for field, value in fields.items() if printed[field] != value}
+    # The photo is only loaded if a redrawn box overlaps it, which the date lines do not
+    front = renderer.renew_front(front, (record["issue_date"], record["validity_date"]), dates, changes,
+                                 id_number=record["id"], **printed)
+    # Replaced atomically: a failed write leaves the issued card intact and raises before the registry is touched
+    save_card(front, record["front"], record.get("profile", DEFAULT_PROFILE))
+    return dict(record, full_name=member.get("full_name"), issue_date=dates[0], validity_date=dates[1], fields=fields)
+
+
+def run_batch(roster_path, out_dir, manifest_path=None, workers=None, id_store=None, photo_store=None, renew=False,
+              profile=DEFAULT_PROFILE, progress=sys.stderr, layout=DEFAULT_LAYOUT, registry=None, assets_dir=ASSETS_DIR):
+    """
+    Generates the cards for every roster row not yet in the manifest and
+    returns (generated, skipped, failed) counts. With renew, rows already in
+    the manifest are re-dated to today's issue date unless they already
+    carry it; renewed cards count as generated. Fronts are written with the
+    print profile named by profile (see idcard_core.encoding) in the card
+    layout named by layout (see idcard_core.templates), with its background
+    images looked up in assets_dir. Every card is
+    recorded in the card registry at registry (see idcard_core.registry)
+    before it is added to the manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(out_dir, "manifest.jsonl")
+    done = read_manifest(manifest_path)
+    done_by_id = {record["id"]: record for record in done.values() if record.get("id")}
+    renderer = CardRenderer(layout, assets_dir)
+    cards = open_registry(registry)
+    required = REQUIRED_FIELDS if layout == DEFAULT_LAYOUT else tuple(renderer.fields)  # Keeps kdo manifest keys
+    dates = renderer.card_dates()
+    back_side_path = None
+    if renderer.back_spec is not None:
+        back_side_path = save_back_side(renderer.back_spec, out_dir)  # Shared by every card
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4  # Bounded so huge rosters do not pile up in memory
+    generated = skipped = failed = 0
+    started = time.monotonic()
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(layout, assets_dir)) as pool:
+        pending = {}
+
+        def collect(finished):
+            nonlocal generated, failed
+            for future in finished:
+                row_number, member = pending.pop(future)
+                try:
+                    # Raises if the card could not be written, so the registry only records cards on disk
+                    record = future.result()
+                    record["back"] = back_side_path
+                    if record["key"] in done:
+                        cards.renew(record["id"], renderer.parse_date(record["issue_date"]),
+                                    renderer.parse_date(record["validity_date"]), record["fields"])
+                    elif record["id"] is not None:
+                        cards.record_many([manifest_entry(renderer, record, member)])
+                except Exception as e:
+                    failed += 1
+                    print(f"row {row_number}: failed: {e}", file=progress)
+                    continue
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+                generated += 1
+                rate = generated / max(time.monotonic() - started, 1e-9)
+                print(f"[{generated}] {record['id']} {record['full_name']} ({rate:.1f} cards/s)", file=progress)
+
+        seen = {}
+        for row_number, member in enumerate(read_roster(roster_path), start=1):
+            missing = [field for field in required if not member.get(field)]
+            if missing:
+                failed += 1
+                print(f"row {row_number}: missing {', '.join(missing)}", file=progress)
+                continue
+            key = member_key(member, required)
+            if key in seen:
+                failed += 1
+                print(f"row {row_number}: same member as row {seen[key]}", file=progress)
+                continue
+            seen[key] = row_number
+            # Cards issued before member_key() are found by their ID or by the old row-based key
+            record = (done.get(key) or done_by_id.get(member.get("id_number"))
+                      or done.get(_legacy_member_key(row_number, member, required)))
+            if record is not None and (not renew or record.get("issue_date") == dates[0]):
+                skipped += 1
+                continue
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            if record is not None:
+                old_fields = record.get("fields")
+                if old_fields is None and record.get("key") != _legacy_member_key(row_number, member, required):
+                    # Listed before manifests kept the printed fields: the registry has them
+                    old_fields = (cards.get(record["id"]) or {}).get("fields") if record.get("id") else None
+                future = pool.submit(_renew_member, record, member, dates, layout, old_fields, assets_dir)
+            else:
+                future = pool.submit(_render_member, key, member, out_dir, id_store, photo_store, profile, None, layout,
+                                     assets_dir)
+            pending[future] = (row_number, member)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+
+    return generated, skipped, failed
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Generate ID cards from a CSV or JSONL roster")
+    parser.add_argument("roster", help="CSV or JSONL file with one member per row")
+    parser.add_argument("-o", "--out", default="cards", help="Directory for the generated cards")
+    parser.add_argument("-m", "--manifest", help="Manifest path (default: <out>/manifest.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--id-store", help="Card ID store (default: issued_ids.sqlite3 at the repository root or $IDCARD_ID_STORE)")
+    parser.add_argument("--registry", help="Card registry (default: card_registry.sqlite3 at the repository root or $IDCARD_REGISTRY)")
+    parser.add_argument("--photo-store", help="Content-addressed photo store directory (deduplicates photos across runs)")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="Card layout template, by name or path (default: kdo)")
+    parser.add_argument("--assets-dir", default=ASSETS_DIR,
+                        help="Directory of the layout's background images (default: images/ at the repository root)")
+    parser.add_argument("--renew", action="store_true", help="Re-date cards already in the manifest instead of skipping them")
+    parser.add_argument("--profile", choices=PRINT_PROFILES, default=DEFAULT_PROFILE,
+                        help="PNG encoding: fast (quick to write), default, or archival (smallest files)")
+    args = parser.parse_args(argv)
+
+    generated, skipped, failed = run_batch(
+        args.roster, args.out, args.manifest, args.workers, args.id_store, args.photo_store, args.renew, args.profile,
+        layout=args.layout, registry=args.registry, assets_dir=args.assets_dir)
+    print(f"Generated {generated} cards, skipped {skipped} already done, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Output encoding profiles for rendered cards.
+
+    default    PNG at Pillow's default zlib level (6), lossless
+    fast       PNG at zlib level 1: several times faster to write, larger files
+    archival   PNG quantised to a 256-colour palette and optimised; the
+               mostly flat card artwork survives well, the photo is dithered
+    web        half-size WebP preview for browsers
+    web-avif   half-size AVIF preview (needs Pillow built with libavif)
+
+The print profiles (default, fast, archival) keep the full 1010x637 card and
+can be imposed and printed; the web profiles are previews only. Measured
+encode time and bytes per card for each profile are part of
+benchmarks/bench_cards.py.
+"""
+from io import BytesIO
+
+from PIL import Image, features
+
+from idcard_core.files import write_file
+from idcard_core.profiling import stage
+
+PROFILES = {
+    "default": {"format": "PNG", "options": {}},
+    "fast": {"format": "PNG", "options": {"compress_level": 1}},
+    "archival": {"format": "PNG", "quantize": 256, "options": {"optimize": True}},
+    "web": {"format": "WEBP", "width": 505, "options": {"quality": 80, "method": 4}},
+    "web-avif": {"format": "AVIF", "width": 505, "options": {"quality": 60}},
+}
+
+# Profiles that keep the card at print resolution
+PRINT_PROFILES = [name for name, profile in PROFILES.items() if "width" not in profile]
+
+EXTENSIONS = {"PNG": ".png", "WEBP": ".webp", "AVIF": ".avif"}
+
+DEFAULT_PROFILE = "default"
+
+
+def available_profiles():
+    """
+    Returns the names of the profiles this Pillow build can encode.
+    """
+    return [name for name, profile in PROFILES.items()
+            if profile["format"] != "AVIF" or features.check("avif")]
+
+
+def profile_extension(profile):
+    """
+    Returns the file extension, with its dot, for files written with profile.
+    """
+    return EXTENSIONS[PROFILES[profile]["format"]]
+
+
+def encode_card(image, profile=DEFAULT_PROFILE):
+    """
+    Returns image encoded with the named profile.
+    """
+    settings = PROFILES[profile]
+    with stage("encode", profile=profile):
+        width = settings.get("width")
+        if width and image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS, reducing_gap=2.0)
+        if settings.get("quantize"):
+            # Fast octree is the quantiser Pillow supports for images with alpha
+            image = image.quantize(colors=settings["quantize"], method=Image.FASTOCTREE)
+        buffer = BytesIO()
+        image.save(buffer, format=settings["format"], **settings["options"])
+        return buffer.getvalue()
+
+
+def save_card(image, path, profile=DEFAULT_PROFILE):
+    """
+    Encodes image with profile and writes it to path atomically, so an
+    existing card is never left half-written.
+    """
+    return write_file(path, encode_card(image, profile))
@@ -0,0 +1,59 @@
+"""
+Bounded in-memory event log for long-running servers.
+
+EventLog keeps the newest max_events messages in a ring buffer: appending is
+O(1) and the oldest event is dropped once the log is full, so memory stays
+flat however long the server runs. Status pages read it a page at a time,
+newest first, instead of rendering the whole history.
+"""
+import math
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+
+class EventLog:
+    """
+    Ring buffer of (timestamp, message) events.
+    """
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self._events = deque(maxlen=max_events)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def append(self, message):
+        """
+        Records message with the current time, dropping the oldest event if
+        the log is full.
+        """
+        with self._lock:
+            self._events.append((time.time(), message))
+            self._total += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    @property
+    def dropped(self):
+        """
+        Number of events dropped to keep the log bounded.
+        """
+        with self._lock:
+            return self._total - len(self._events)
+
+    def page(self, number=1, per_page=50):
+        """
+        Returns (events, number, pages): page number (counting from 1,
+        clamped to the pages held) of the log, newest event first, and the
+        number of pages held.
+        """
+        with self._lock:
+            pages = max(math.ceil(len(self._events) / per_page), 1)
+            number = min(max(number, 1), pages)
+            offset = (number - 1) * per_page
+            events = list(islice(reversed(self._events), offset, offset + per_page))
+        return events, number, pages
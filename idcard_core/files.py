@@ -0,0 +1,18 @@
+"""
+Atomic file writes shared by everything that saves card files.
+"""
+import os
+import threading
+
+
+def write_file(path, data):
+    """
+    Writes bytes to path atomically, so readers never see a partial file,
+    and returns path. The temporary file is private to this process and
+    thread, so concurrent writers of the same path never collide.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,86 @@
+"""
+Process-wide registry of loaded fonts.
+
+ImageFont.truetype() searches the font directories and loads a FreeType face
+on every call. The registry loads each (font, size) pair once and hands the
+same font object to every caller. Pillow holds the GIL while it renders text,
+so one font object can be shared by worker threads.
+"""
+import threading
+
+from PIL import ImageFont
+
+# Fonts tried, in order, when the requested font is not installed
+FALLBACK_FONTS = ("arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+
+_fonts = {}
+_resolved = {}
+_lock = threading.Lock()
+_stats = {"loads": 0, "hits": 0}
+
+
+def resolve_font(name):
+    """
+    Returns the first loadable font among name and FALLBACK_FONTS, or None
+    when none is installed (Pillow's built-in font is used then). The answer
+    is remembered, so the search happens once per name.
+    """
+    with _lock:
+        if name in _resolved:
+            return _resolved[name]
+    resolved = None
+    for candidate in (name, *FALLBACK_FONTS):
+        try:
+            ImageFont.truetype(candidate, 10)
+        except OSError:
+            continue
+        resolved = candidate
+        break
+    with _lock:
+        _resolved[name] = resolved
+    return resolved
+
+
+def get_font(name, size):
+    """
+    Returns the shared font object for (name, size), loading it on first use.
+    """
+    key = (name, size)
+    with _lock:
+        font = _fonts.get(key)
+        if font is not None:
+            _stats["hits"] += 1
+            return font
+
+    resolved = resolve_font(name)
+    if resolved is None:
+        font = ImageFont.load_default(size)
+    else:
+        font = ImageFont.truetype(resolved, size)
+
+    with _lock:
+        # Another thread may have loaded it meanwhile; keep the first one
+        if key in _fonts:
+            _stats["hits"] += 1
+            return _fonts[key]
+        _fonts[key] = font
+        _stats["loads"] += 1
+    return font
+
+
+def preload_fonts(keys):
+    """
+    Resolves and loads every (name, size) in keys, e.g. at application start
+    so that no card pays for a font search.
+    """
+    for name, size in keys:
+        get_font(name, size)
+
+
+def font_stats():
+    """
+    Returns how many faces were loaded, how many lookups were served from the
+    registry and how many fonts are held.
+    """
+    with _lock:
+        return {"loads": _stats["loads"], "hits": _stats["hits"], "entries": len(_fonts)}
@@ -0,0 +1,89 @@
+"""
+Cache validators and preview thumbnails for card images served over HTTP.
+
+ETags are the SHA-256 of a file's bytes, hashed once per modification time
+and size, so a card keeps its ETag for as long as its content does and
+browsers can revalidate with a cheap 304. Files whose name already carries
+their content key (the shared back side, id_card_back_<key>.png) never change
+and can be cached as immutable.
+
+Thumbnails are downscaled previews of the print-resolution cards, encoded
+as WebP or PNG once and kept in a bounded in-memory LRU cache.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+# Thumbnails kept in memory; a half-size WebP card is about 30 KB
+THUMBNAIL_CACHE_SIZE = 256
+
+# Formats a thumbnail can be encoded in, by MIME type
+THUMBNAIL_FORMATS = {"image/webp": "WEBP", "image/png": "PNG"}
+
+# Names of files addressed by their content (see idcard_core.backs)
+_CONTENT_ADDRESSED = re.compile(r"_[0-9a-f]{16}\.png$")
+
+_digests = {}
+_thumbnails = OrderedDict()
+_lock = threading.Lock()
+
+
+def file_digest(path):
+    """
+    Returns the SHA-256 hex digest of the file at path, hashing it again
+    only when its modification time or size changes.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _digests.get(key)
+    if cached is None or cached[0] != version:
+        with open(path, "rb") as f:
+            cached = (version, hashlib.sha256(f.read()).hexdigest())
+        with _lock:
+            _digests[key] = cached
+    return cached[1]
+
+
+def is_content_addressed(path):
+    """
+    Tells whether the file name at path carries its content key, so the
+    file can be cached forever.
+    """
+    return bool(_CONTENT_ADDRESSED.search(os.path.basename(path)))
+
+
+def card_thumbnail(path, width, mime_type="image/webp"):
+    """
+    Returns (etag, bytes) for the card image at path scaled to width pixels
+    wide and encoded as mime_type (image/webp or image/png).
+    """
+    etag = f"{file_digest(path)}-{width}-{THUMBNAIL_FORMATS[mime_type].lower()}"
+    with _lock:
+        data = _thumbnails.get(etag)
+        if data is not None:
+            _thumbnails.move_to_end(etag)
+            return etag, data
+
+    with Image.open(path) as image:
+        image.draft("RGB", (width, width))
+        height = max(round(image.height * width / image.width), 1)
+        thumbnail = image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+    buffer = BytesIO()
+    if mime_type == "image/webp":
+        thumbnail.save(buffer, format="WEBP", quality=80, method=4)
+    else:
+        thumbnail.save(buffer, format="PNG", optimize=True)
+    data = buffer.getvalue()
+
+    with _lock:
+        _thumbnails[etag] = data
+        while len(_thumbnails) > THUMBNAIL_CACHE_SIZE:
+            _thumbnails.popitem(last=False)
+    return etag, data
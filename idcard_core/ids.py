@@ -0,0 +1,232 @@
+"""
+Collision-free card ID allocation.
+
+IDs come from a persistent counter stored in SQLite. Counter values are mapped
+to card numbers with a bijection of the ID space (an affine map modulo
+10**width), so consecutive cards get unrelated-looking numbers that can
+never repeat. There is one counter per ID width: 9-digit IDs with a Luhn
+check digit share the counter of plain 10-digit IDs and only use the counter
+values that map to a number with a valid check digit, so the two formats can
+never hand out the same ID. The map's offset is drawn at random when a store is created and
+saved in it, so a new store does not start with the same IDs as every other
+one. Each allocator reserves counter values in blocks with a single committed
+UPDATE and hands IDs out from memory, so worker processes only touch the
+database once per block. A crash can leave a gap in the sequence, never a
+duplicate.
+
+Every front end uses the same store by default, issued_ids.sqlite3 at the
+repository root ($IDCARD_ID_STORE overrides it), whatever directory it runs
+from.
+
+IDs issued before this store existed (random ones) can be registered with
+register_existing(); the allocator skips them.
+
+    python -m idcard_core.ids register cards/   # import IDs of existing cards
+"""
+import argparse
+import os
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+
+# Where the shared ID store and card registry live by default: the repository root
+DATA_DIR = os.environ.get("IDCARD_DATA_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_STORE = os.environ.get("IDCARD_ID_STORE", os.path.join(DATA_DIR, "issued_ids.sqlite3"))
+
+# Multiplier of the counter -> ID mapping; it must be coprime with 10 so the
+# mapping is a bijection for every ID length
+_MULTIPLIER = 7368787
+
+# Offset of stores created before offsets were drawn per store
+_LEGACY_OFFSET = 1940044
+
+
+# Function to compute the Luhn check digit of a string of digits
+def luhn_digit(digits):
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+class IdAllocator:
+    """
+    Hands out unique card IDs of a fixed length, optionally followed by a
+    Luhn check digit. One allocator can be shared by threads; each process
+    should open its own.
+    """
+
+    def __init__(self, path=DEFAULT_STORE, digits=9, check_digit=False, block_size=256):
+        self.path = path
+        self.digits = digits
+        self.check_digit = check_digit
+        self.block_size = block_size
+        self.width = digits + 1 if check_digit else digits
+        self.sequence = str(self.width)  # Shared by every format of this width
+        self._space = 10 ** self.width
+        # About one counter value in ten maps to a number with a valid check digit
+        self._block = block_size * 10 if check_digit else block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS existing_ids (id TEXT PRIMARY KEY)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._offset = self._load_offset()
+        if check_digit:
+            self._retire_luhn_sequence()
+        self._existing = {row[0] for row in self._connection.execute("SELECT id FROM existing_ids")}
+
+    def _load_offset(self):
+        # Read the store's offset, drawing it on first use; a store that has
+        # already issued IDs keeps the offset they were issued with
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT value FROM settings WHERE name = 'offset'").fetchone()
+            if row is None:
+                used = connection.execute("SELECT 1 FROM sequences LIMIT 1").fetchone()
+                row = (_LEGACY_OFFSET if used else secrets.randbelow(10 ** 18),)
+                connection.execute("INSERT INTO settings (name, value) VALUES ('offset', ?)", row)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return row[0]
+
+    def _retire_luhn_sequence(self):
+        # Stores written before sequences were shared per width kept a separate
+        # "<digits>+luhn" counter; its IDs are registered as existing so the
+        # shared counter skips them, then the old counter is dropped
+        connection = self._connection
+        legacy = f"{self.digits}+luhn"
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT next FROM sequences WHERE name = ?", (legacy,)).fetchone()
+            if row is not None:
+                space = 10 ** self.digits
+                numbers = (str((counter * _MULTIPLIER + self._offset) % space).zfill(self.digits) for counter in range(row[0]))
+                connection.executemany("INSERT OR IGNORE INTO existing_ids (id) VALUES (?)",
+                                       ((number + luhn_digit(number),) for number in numbers))
+                connection.execute("DELETE FROM sequences WHERE name = ?", (legacy,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _reserve(self, count):
+        # Claim counter values [start, start + count) in one committed write
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR IGNORE INTO sequences (name, next) VALUES (?, 0)", (self.sequence,))
+            start = connection.execute("SELECT next FROM sequences WHERE name = ?", (self.sequence,)).fetchone()[0]
+            end = min(start + count, self._space)
+            if start >= end:
+                raise RuntimeError(f"ID space of {self.width} digits is exhausted")
+            connection.execute("UPDATE sequences SET next = ? WHERE name = ?", (end, self.sequence))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return start, end
+
+    def _format(self, counter):
+        # The ID for a counter value, or None if it has no valid check digit
+        number = str((counter * _MULTIPLIER + self._offset) % self._space).zfill(self.width)
+        if self.check_digit and number[-1] != luhn_digit(number[:-1]):
+            return None
+        return number
+
+    def next_id(self):
+        """
+        Returns the next unused ID.
+        """
+        with self._lock:
+            while True:
+                if self._next >= self._end:
+                    self._next, self._end = self._reserve(self._block)
+                card_id = self._format(self._next)
+                self._next += 1
+                if card_id is not None and card_id not in self._existing:
+                    return card_id
+
+    def allocate_block(self, count):
+        """
+        Returns count unused IDs at once, e.g. to hand to a worker.
+        """
+        return [self.next_id() for _ in range(count)]
+
+    def register_existing(self, ids):
+        """
+        Records IDs issued outside the allocator so they are never handed out.
+        """
+        ids = [card_id for card_id in ids if card_id not in self._existing]
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.executemany("INSERT OR IGNORE INTO existing_ids (id) VALUES (?)", [(card_id,) for card_id in ids])
+            self._connection.execute("COMMIT")
+            self._existing.update(ids)
+        return len(ids)
+
+    def close(self):
+        self._connection.close()
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def generate_id(digits=9, check_digit=False, path=None):
+    """
+    Returns a new unique ID from the process-wide allocator for this format.
+    """
+    key = (os.getpid(), os.path.abspath(path or DEFAULT_STORE), digits, check_digit)
+    with _allocators_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = IdAllocator(key[1], digits=digits, check_digit=check_digit)
+            _allocators[key] = allocator
+    return allocator.next_id()
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Card ID store maintenance")
+    subparsers = parser.add_subparsers(dest="command")
+    register_parser = subparsers.add_parser("register", help="Register the IDs of cards already on disk")
+    register_parser.add_argument("directories", nargs="+", help="Directories holding id_card_front_<id>.png files")
+    register_parser.add_argument("--store", default=DEFAULT_STORE, help="ID store path")
+    args = parser.parse_args(argv)
+
+    if args.command != "register":
+        parser.print_help()
+        return 1
+
+    pattern = re.compile(r"id_card_front_(\d+)\.png$")
+    ids = set()
+    for directory in args.directories:
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                ids.add(match.group(1))
+    allocator = IdAllocator(args.store)
+    added = allocator.register_existing(sorted(ids))
+    allocator.close()
+    print(f"Registered {added} existing IDs in {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
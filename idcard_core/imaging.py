@@ -0,0 +1,41 @@
+"""
+Small image helpers shared by the card layouts.
+"""
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+from idcard_core.profiling import profiled
+
+# Finished alpha masks kept for reuse; a full card mask is about 640 KB
+MASK_CACHE_SIZE = 16
+
+
+@lru_cache(maxsize=MASK_CACHE_SIZE)
+def corner_mask(width, height, radius, supersample=1):
+    """
+    Returns the alpha plane that rounds the corners of a width x height image.
+    With supersample > 1 the quarter circles are drawn that many times larger
+    and scaled down, which anti-aliases the edge. Masks are cached (LRU), so
+    callers must not modify them.
+    """
+    size = radius * 2 * supersample
+    circle = Image.new('L', (size, size), 0)
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, size, size), fill=255)
+    if supersample > 1:
+        circle = circle.resize((radius * 2, radius * 2), Image.LANCZOS)
+
+    alpha = Image.new('L', (width, height), 255)
+    alpha.paste(circle.crop((0, 0, radius, radius)), (0, 0))
+    alpha.paste(circle.crop((radius, 0, radius * 2, radius)), (width - radius, 0))
+    alpha.paste(circle.crop((0, radius, radius, radius * 2)), (0, height - radius))
+    alpha.paste(circle.crop((radius, radius, radius * 2, radius * 2)), (width - radius, height - radius))
+    return alpha
+
+
+# Function to create rounded corners for the ID card
+@profiled("round_corners")
+def round_corners(image, radius=30, supersample=1):
+    image.putalpha(corner_mask(image.width, image.height, radius, supersample))
+    return image
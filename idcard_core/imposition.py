@@ -0,0 +1,241 @@
+"""
+Imposition of many cards per printed sheet.
+
+Cards are laid out in a centred grid on A4 or SRA3 sheets. Every sheet of
+fronts is followed by a sheet of backs whose columns are mirrored, so the
+backs line up with their fronts when the job is printed duplex (long-edge
+flip). Crop marks are drawn in the sheet margin at every cut line.
+
+Each distinct back image is embedded once as a PDF form XObject and reused
+on every sheet. Large jobs can be split into volumes of sheets_per_file
+sheets: reportlab keeps a document in memory until it is saved, so closing
+each volume keeps memory flat on 10k-card runs.
+
+    python -m idcard_core.imposition cards/manifest.jsonl cards.pdf --sheet SRA3
+"""
+import argparse
+import os
+import sys
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from idcard_core.batch import read_manifest
+
+SHEETS = {
+    "A4": A4,
+    "SRA3": (320 * mm, 450 * mm),
+}
+
+# ISO/IEC 7810 ID-1 card size, the same as CARD_WIDTH x CARD_HEIGHT at 300 DPI
+CARD_SIZE = (85.6 * mm, 54 * mm)
+
+
+def sheet_grid(sheet_size, card_size=CARD_SIZE, margin=5 * mm, gap=3 * mm):
+    """
+    Returns the bottom-left corners of the card slots on a sheet, top row
+    first, left to right. The grid is centred so that mirroring it about the
+    vertical axis gives the duplex positions.
+    """
+    sheet_w, sheet_h = sheet_size
+    card_w, card_h = card_size
+    columns = int((sheet_w - 2 * margin + gap) // (card_w + gap))
+    rows = int((sheet_h - 2 * margin + gap) // (card_h + gap))
+    if columns < 1 or rows < 1:
+        raise ValueError("Card does not fit on the sheet")
+
+    grid_w = columns * card_w + (columns - 1) * gap
+    grid_h = rows * card_h + (rows - 1) * gap
+    left = (sheet_w - grid_w) / 2
+    top = (sheet_h + grid_h) / 2
+    return [
+        (left + column * (card_w + gap), top - card_h - row * (card_h + gap))
+        for row in range(rows)
+        for column in range(columns)
+    ]
+
+
+# Function to turn a path, PIL image or encoded bytes into something drawImage accepts
+def _image_source(image):
+    if isinstance(image, Image.Image):
+        return ImageReader(image)
+    if isinstance(image, bytes):
+        return ImageReader(BytesIO(image))
+    return image
+
+
+# Function to draw crop marks in the margin at every cut line of the used slots
+def _draw_crop_marks(c, slots, card_size, sheet_size, length=4 * mm, offset=1 * mm):
+    card_w, card_h = card_size
+    sheet_w, sheet_h = sheet_size
+    xs = sorted({x for x, _ in slots} | {x + card_w for x, _ in slots})
+    ys = sorted({y for _, y in slots} | {y + card_h for _, y in slots})
+    left, right = xs[0], xs[-1]
+    bottom, top = ys[0], ys[-1]
+
+    c.saveState()
+    c.setLineWidth(0.25)
+    for x in xs:
+        c.line(x, top + offset, x, min(top + offset + length, sheet_h))
+        c.line(x, bottom - offset, x, max(bottom - offset - length, 0))
+    for y in ys:
+        c.line(left - offset, y, max(left - offset - length, 0), y)
+        c.line(right + offset, y, min(right + offset + length, sheet_w), y)
+    c.restoreState()
+
+
+class Imposer:
+    """
+    Writes (front, back) card pairs onto imposed sheets. Fronts and backs may
+    be file paths, PIL images or encoded image bytes.
+    """
+
+    def __init__(self, pdf_path, sheet="A4", crop_marks=True, duplex=True, sheets_per_file=None):
+        self.pdf_path = pdf_path
+        self.sheet_size = SHEETS[sheet]
+        self.slots = sheet_grid(self.sheet_size)
+        self.crop_marks = crop_marks
+        self.duplex = duplex
+        self.sheets_per_file = sheets_per_file
+        self.paths = []
+        self._canvas = None
+        self._forms = {}
+        self._pending = []
+        self._sheets_in_file = 0
+
+    def _volume_path(self):
+        if not self.sheets_per_file:
+            return self.pdf_path
+        stem, ext = os.path.splitext(self.pdf_path)
+        return f"{stem}_{len(self.paths) + 1:03d}{ext or '.pdf'}"
+
+    def _open(self):
+        path = self._volume_path()
+        self.paths.append(path)
+        self._canvas = canvas.Canvas(path, pagesize=self.sheet_size)
+        self._forms = {}
+        self._sheets_in_file = 0
+
+    def _close(self):
+        if self._canvas is not None:
+            self._canvas.save()
+            self._canvas = None
+
+    def _back_form(self, back):
+        # Embed each distinct back once per file and reuse it as a form XObject.
+        # An image is keyed by its id and kept next to its form, so the id
+        # cannot be reused by another image while this file is open.
+        key = back if isinstance(back, (str, bytes)) else id(back)
+        form = self._forms.get(key)
+        if form is None:
+            name = f"card_back_{len(self._forms)}"
+            card_w, card_h = CARD_SIZE
+            self._canvas.beginForm(name, 0, 0, card_w, card_h)
+            self._canvas.drawImage(_image_source(back), 0, 0, width=card_w, height=card_h, mask="auto")
+            self._canvas.endForm()
+            form = self._forms[key] = (name, back)
+        return form[0]
+
+    def _flush_sheet(self):
+        if self._canvas is None:
+            self._open()
+        c = self._canvas
+        card_w, card_h = CARD_SIZE
+        sheet_w = self.sheet_size[0]
+        used = self.slots[:len(self._pending)]
+
+        # Fronts
+        for (x, y), (front, _) in zip(used, self._pending):
+            c.drawImage(_image_source(front), x, y, width=card_w, height=card_h, mask="auto")
+        if self.crop_marks:
+            _draw_crop_marks(c, used, CARD_SIZE, self.sheet_size)
+        c.showPage()
+
+        # Backs, mirrored left-right when printing duplex
+        back_slots = [(sheet_w - x - card_w, y) for x, y in used] if self.duplex else used
+        for (x, y), (_, back) in zip(back_slots, self._pending):
+            if back is None:
+                continue
+            name = self._back_form(back)
+            c.saveState()
+            c.translate(x, y)
+            c.doForm(name)
+            c.restoreState()
+        if self.crop_marks:
+            _draw_crop_marks(c, back_slots, CARD_SIZE, self.sheet_size)
+        c.showPage()
+
+        self._pending = []
+        self._sheets_in_file += 1
+        if self.sheets_per_file and self._sheets_in_file >= self.sheets_per_file:
+            self._close()
+
+    def add(self, front, back):
+        """
+        Queues one card; a sheet is written as soon as it is full.
+        """
+        self._pending.append((front, back))
+        if len(self._pending) == len(self.slots):
+            self._flush_sheet()
+
+    def close(self):
+        """
+        Writes the last, partly filled sheet and saves the PDF. Returns the
+        list of files written.
+        """
+        if self._pending:
+            self._flush_sheet()
+        self._close()
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def impose_pdf(cards, pdf_path, sheet="A4", crop_marks=True, duplex=True, sheets_per_file=None):
+    """
+    Imposes an iterable of (front, back) pairs and returns the files written.
+    """
+    with Imposer(pdf_path, sheet, crop_marks, duplex, sheets_per_file) as imposer:
+        for front, back in cards:
+            imposer.add(front, back)
+    return imposer.paths
+
+
+# Function to read (front, back) pairs from a batch manifest, once per card
+# (renewals list a card again)
+def _manifest_cards(path):
+    for record in read_manifest(path).values():
+        yield record["front"], record.get("back")
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Impose generated cards onto print sheets")
+    parser.add_argument("manifest", help="Manifest written by python -m idcard_core.batch")
+    parser.add_argument("pdf", help="Output PDF path")
+    parser.add_argument("--sheet", choices=sorted(SHEETS), default="A4", help="Sheet size")
+    parser.add_argument("--no-crop-marks", action="store_true", help="Leave out crop marks")
+    parser.add_argument("--simplex", action="store_true", help="Do not mirror the back sheets")
+    parser.add_argument("--sheets-per-file", type=int, help="Split the job into files of this many sheets")
+    args = parser.parse_args(argv)
+
+    paths = impose_pdf(
+        _manifest_cards(args.manifest), args.pdf, args.sheet,
+        crop_marks=not args.no_crop_marks, duplex=not args.simplex, sheets_per_file=args.sheets_per_file,
+    )
+    print(f"Wrote {', '.join(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+In-process render job queue.
+
+Web requests submit render jobs and return straight away; a fixed pool of
+worker threads renders them. The queue is bounded: when it is full, submit()
+raises QueueFull so the caller can answer with HTTP 429 instead of piling up
+work. Finished jobs are kept (up to keep_finished of them) so clients can
+poll or long-poll their status.
+"""
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class QueueFull(Exception):
+    """
+    Raised by RenderQueue.submit() when no more jobs can be accepted.
+    """
+
+
+class RenderQueue:
+    """
+    Bounded job queue served by worker threads.
+    """
+
+    def __init__(self, workers=2, max_pending=32, keep_finished=1000):
+        self.workers = workers
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """
+        Starts the worker threads (once).
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"render-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues func(*args, **kwargs) and returns the job ID.
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        job = {"status": "queued", "result": None, "error": None, "done": threading.Event()}
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise QueueFull("Render queue is full") from None
+        return job_id
+
+    def _work(self):
+        while True:
+            job_id, func, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            job["status"] = "running"
+            try:
+                job["result"] = func(*args, **kwargs)
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = str(e)
+                job["status"] = "failed"
+            job["done"].set()
+            self._forget_old_jobs()
+
+    def _forget_old_jobs(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job["done"].is_set()]
+            for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+                del self._jobs[job_id]
+
+    def status(self, job_id, wait=0):
+        """
+        Returns a dict with the job's status, result and error, or None for
+        an unknown job. With wait > 0, blocks up to wait seconds for an
+        unfinished job to complete (long polling).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job["done"].wait(wait)
+        return {"status": job["status"], "result": job["result"], "error": job["error"]}
+
+    def forget(self, job_id):
+        """
+        Drops a finished job and its result once the caller has taken it,
+        rather than keeping it until keep_finished newer jobs push it out.
+        Returns False for an unknown or unfinished job.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job["done"].is_set():
+                return False
+            del self._jobs[job_id]
+            return True
+
+    def depth(self):
+        """
+        Returns the number of jobs waiting for a worker.
+        """
+        return self._queue.qsize()
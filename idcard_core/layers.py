@@ -0,0 +1,164 @@
+"""
+Layered card model for incremental re-rendering.
+
+A card is a background plus a stack of layers (the member photo, the
+barcode, one layer per text field), drawn in order. Every layer knows the
+box it covers, so changing a field only recomposites the boxes it touched:
+the background is cropped back in and the layers overlapping those boxes are
+drawn again. Renewing a card (new issue and expiry dates) therefore redraws
+two short lines of text instead of the whole front.
+
+Image layers are loaded lazily, so a card rebuilt from an already rendered
+image (see LayeredCard's base argument) never decodes the photo or renders
+the barcode unless a changed box overlaps them.
+"""
+from PIL import ImageDraw
+
+from idcard_core.fonts import get_font
+from idcard_core.profiling import profiled
+
+
+# Function to give the smallest box covering both boxes
+def _union(first, second):
+    return (min(first[0], second[0]), min(first[1], second[1]), max(first[2], second[2]), max(first[3], second[3]))
+
+
+# Function to tell whether two boxes overlap
+def _overlaps(first, second):
+    return first[0] < second[2] and second[0] < first[2] and first[1] < second[3] and second[1] < first[3]
+
+
+class ImageLayer:
+    """
+    An image pasted at position through its own alpha. load(value) returns
+    the image and is only called when the layer is drawn; size is the size
+    of that image, known up front.
+    """
+
+    def __init__(self, position, size, load, field=None, value=None):
+        self.position = position
+        self.size = size
+        self.field = field
+        self._load = load
+        self._value = value
+        self._image = None
+
+    def set(self, value):
+        self._value = value
+        self._image = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = self._load(self._value)
+        return self._image
+
+    @property
+    def bbox(self):
+        x, y = self.position
+        return (x, y, x + self.size[0], y + self.size[1])
+
+    def overlaps(self, box):
+        return _overlaps(self.bbox, box)
+
+    def draw(self, region, origin):
+        image = self.image
+        mask = image if "A" in image.getbands() else None  # Square photos have no alpha
+        region.paste(image, (self.position[0] - origin[0], self.position[1] - origin[1]), mask)
+
+
+class TextLayer:
+    """
+    One line of text, template.format(value), drawn at position. Measuring
+    text is slow compared with drawing it, so the box is cached per text.
+    """
+
+    def __init__(self, position, template, font, size, field=None, value="", fill="white"):
+        self.position = position
+        self.template = template
+        self.font = (font, size)
+        self.field = field
+        self.fill = fill
+        self._value = value
+        self._bbox = None
+
+    def set(self, value):
+        self._value = value
+        self._bbox = None
+
+    @property
+    def text(self):
+        return self.template.format(self._value)
+
+    @property
+    def bbox(self):
+        if self._bbox is None:
+            left, top, right, bottom = get_font(*self.font).getbbox(self.text)
+            x, y = self.position
+            self._bbox = (x + left, y + top, x + right, y + bottom)
+        return self._bbox
+
+    def overlaps(self, box):
+        # Lines outside the box vertically are rejected from the font's line
+        # height alone, without measuring their text
+        ascent, descent = get_font(*self.font).getmetrics()
+        y = self.position[1]
+        if y >= box[3] or y + ascent + descent <= box[1]:
+            return False
+        return _overlaps(self.bbox, box)
+
+    @profiled("text")
+    def draw(self, region, origin):
+        draw = ImageDraw.Draw(region)
+        draw.text((self.position[0] - origin[0], self.position[1] - origin[1]), self.text, fill=self.fill, font=get_font(*self.font))
+
+
+class LayeredCard:
+    """
+    A background ImageLayer and the layers drawn on top of it, in order.
+    base is an already rendered image of the same card, used as the canvas
+    instead of compositing every layer again.
+    """
+
+    def __init__(self, background, layers, base=None):
+        self.background = background
+        self.layers = layers
+        self._canvas = base
+
+    @property
+    def image(self):
+        """
+        Returns the composited card, rendering it in full on first use. The
+        image is updated in place by update(), so copy it to keep a version.
+        """
+        if self._canvas is None:
+            self._canvas = self._composite(self.background.bbox)
+        return self._canvas
+
+    def _composite(self, box):
+        region = self.background.image.crop(box)
+        for layer in self.layers:
+            if layer.overlaps(box):
+                layer.draw(region, box[:2])
+        return region
+
+    def update(self, **fields):
+        """
+        Sets new field values and redraws only the boxes they changed.
+        Returns the list of redrawn boxes.
+        """
+        canvas = self.image
+        dirty = []
+        for layer in self.layers:
+            if layer.field in fields:
+                old_box = layer.bbox
+                layer.set(fields[layer.field])
+                dirty.append(_union(old_box, layer.bbox))
+
+        card_box = self.background.bbox
+        for box in dirty:
+            # Clamp to the card; text may overhang its edges
+            box = (max(box[0], card_box[0]), max(box[1], card_box[1]), min(box[2], card_box[2]), min(box[3], card_box[3]))
+            if box[0] < box[2] and box[1] < box[3]:
+                canvas.paste(self._composite(box), box[:2])
+        return dirty
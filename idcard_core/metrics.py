@@ -0,0 +1,161 @@
+"""
+Render counters and latency histograms in the Prometheus text format.
+
+A Metrics registry holds counters, gauges and histograms, each optionally
+split by labels, and renders them as the text a Prometheus server scrapes
+(exposition format 0.0.4). It needs no client library and keeps only a few
+numbers per series, so recording a value costs a dict lookup under a lock.
+
+    metrics = Metrics()
+    metrics.describe("idcard_cards_rendered_total", "counter", "Cards rendered")
+    metrics.inc("idcard_cards_rendered_total")
+    metrics.observe("idcard_render_stage_seconds", 0.012, stage="front")
+    metrics.render()
+
+cache_stats() collects the hit and miss counters of the process-wide caches
+(fonts, background templates, back sides), so a render can report how many
+lookups each cache served.
+"""
+import bisect
+import threading
+
+# Histogram bucket bounds in seconds, from a cache hit to a cold render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Content type of the text format, for the HTTP response
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def cache_stats():
+    """
+    Returns {"fonts": ..., "templates": ..., "backs": ...}, each a dict
+    with the cache's hits and misses so far in this process.
+    """
+    # Imported here so that a metrics endpoint does not load Pillow
+    from idcard_core.assets import template_cache_stats
+    from idcard_core.backs import back_cache_stats
+    from idcard_core.fonts import font_stats
+
+    fonts = font_stats()
+    templates = template_cache_stats()
+    backs = back_cache_stats()
+    return {
+        "fonts": {"hits": fonts["hits"], "misses": fonts["loads"]},
+        "templates": {"hits": templates["hits"], "misses": templates["misses"]},
+        "backs": {"hits": backs["hits"], "misses": backs["misses"]},
+    }
+
+
+def cache_stats_delta(before, after):
+    """
+    Returns the hits and misses each cache served between two cache_stats()
+    snapshots.
+    """
+    return {name: {count: after[name][count] - before[name][count] for count in ("hits", "misses")}
+            for name in after}
+
+
+# Function to format a number the way Prometheus expects it
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Function to format a label set as {name="value",...}
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Registry of counters, gauges and histograms. Series are created on first
+    use; describe() adds the HELP and TYPE lines.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._kinds = {}
+        self._help = {}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        """
+        Declares name as a "counter", "gauge" or "histogram" with help_text.
+        """
+        with self._lock:
+            self._kinds[name] = kind
+            self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Adds amount to the counter name.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._kinds.setdefault(name, "counter")
+            series = self._series.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """
+        Sets the gauge name to value.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._kinds.setdefault(name, "gauge")
+            self._series.setdefault(name, {})[key] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Records value (e.g. seconds) in the histogram name.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._kinds.setdefault(name, "histogram")
+            series = self._series.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def value(self, name, **labels):
+        """
+        Returns the current value of a counter or gauge, 0 if never set.
+        """
+        with self._lock:
+            return self._series.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        """
+        Returns every series in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._series):
+                kind = self._kinds[name]
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._series[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*self.buckets, float("inf")), (*value["counts"], None)):
+                        cumulative = value["count"] if count is None else cumulative + count
+                        bucket_labels = (*labels, ("le", _format_value(bound)))
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
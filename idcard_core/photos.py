@@ -0,0 +1,83 @@
+"""
+Member photo ingestion.
+
+Phone photos are often 12-50 MP, while the card only shows a 200x200 slot.
+Photos are decoded close to that size (JPEG draft mode, which lets libjpeg
+scale by 1/2, 1/4 or 1/8 while decoding, and Image.reduce for other formats),
+turned upright using their EXIF orientation and centre-cropped to the slot.
+Uploads are read in chunks with a hard size cap, and only the normalised
+thumbnail is kept.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from idcard_core.imaging import round_corners
+from idcard_core.profiling import profiled
+
+# Size of the photo slot on the card front
+PHOTO_SIZE = (200, 200)
+
+# Largest upload accepted, in bytes
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+
+class PhotoTooLarge(ValueError):
+    """
+    Raised when an uploaded photo exceeds the size cap.
+    """
+
+
+def read_upload(stream, max_bytes=MAX_UPLOAD_BYTES, chunk_size=64 * 1024):
+    """
+    Reads an uploaded file stream in chunks and returns its bytes, raising
+    PhotoTooLarge as soon as more than max_bytes arrive.
+    """
+    buffer = BytesIO()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise PhotoTooLarge(f"Photo is larger than {max_bytes // (1024 * 1024)} MB")
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+@profiled("photo")
+def load_photo(source, size=PHOTO_SIZE):
+    """
+    Returns the photo at source (a path or file object) as an upright RGB
+    image of exactly size, centre-cropped, decoding as little as possible.
+    """
+    image = Image.open(source)
+    image.draft("RGB", size)  # JPEG only: decode at the smallest scale still >= size
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    # Largest centred region with the slot's aspect ratio
+    width, height = image.size
+    target_ratio = size[0] / size[1]
+    if width / height > target_ratio:
+        crop_width = height * target_ratio
+        box = ((width - crop_width) / 2, 0, (width + crop_width) / 2, height)
+    else:
+        crop_height = width / target_ratio
+        box = (0, (height - crop_height) / 2, width, (height + crop_height) / 2)
+
+    # reducing_gap shrinks by whole factors with reduce() before the final resample
+    return image.resize(size, Image.LANCZOS, box=box, reducing_gap=2.0)
+
+
+def card_photo(photo, radius=20, size=PHOTO_SIZE):
+    """
+    Returns the member photo ready to paste on the card. photo is either a
+    path or file object (normalised with load_photo and rounded) or an image
+    that is already card-ready, such as a PhotoStore thumbnail. radius=None
+    keeps square corners.
+    """
+    if isinstance(photo, Image.Image):
+        return photo
+    if radius is None:
+        return load_photo(photo, size)
+    return round_corners(load_photo(photo, size), radius=radius)
@@ -0,0 +1,116 @@
+"""
+Content-addressed store for member photos.
+
+Photos are named by the SHA-256 of their bytes and sharded into two levels of
+sub-directories (ab/cd/abcd...), so identical uploads (re-issued cards,
+renewals) are stored once and different members' photos can never overwrite
+each other. Next to each original the store keeps the normalised photo with
+rounded corners, ready to paste, for every photo slot (size and corner
+radius) it was asked for; the 200x200 one used by most layouts is made on
+upload. Re-rendering a card from the store skips the photo decode, resize and
+round_corners entirely.
+
+    root/ab/cd/abcd...ef.jpg                   original upload
+    root/ab/cd/abcd...ef.thumb.png             card-ready 200x200 thumbnail, radius 20
+    root/ab/cd/abcd...ef.thumb-150x150-r0.png  other slots, made on first use
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from idcard_core.files import write_file
+from idcard_core.imaging import round_corners
+from idcard_core.photos import PHOTO_SIZE, load_photo
+
+# Photo slot whose thumbnail is made on upload
+DEFAULT_RADIUS = 20
+
+
+# Function to make the card-ready photo for a slot: normalised to size, corners rounded by radius (None: square)
+def _card_ready(source, size, radius):
+    photo = load_photo(source, size)
+    return round_corners(photo, radius=radius) if radius is not None else photo
+
+
+# Function to encode an image as PNG bytes
+def _png(image):
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class PhotoStore:
+    """
+    Deduplicating photo store rooted at a directory.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _base(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def thumbnail_path(self, digest, size=PHOTO_SIZE, radius=DEFAULT_RADIUS):
+        if (tuple(size), radius) == (PHOTO_SIZE, DEFAULT_RADIUS):
+            return self._base(digest) + ".thumb.png"
+        return self._base(digest) + f".thumb-{size[0]}x{size[1]}-r{radius or 0}.png"
+
+    def original_path(self, digest):
+        """
+        Returns the path of the stored original, or None if it is unknown.
+        """
+        directory = os.path.dirname(self._base(digest))
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(digest) and not name.startswith(".thumb", len(digest)) and not name.endswith(".tmp"):
+                    return os.path.join(directory, name)
+        return None
+
+    def put(self, data):
+        """
+        Stores photo bytes and returns their digest. Bytes already in the
+        store are not decoded or written again. Raises OSError (PIL's
+        UnidentifiedImageError) for data that is not an image and PIL's
+        DecompressionBombError for one over Pillow's pixel limit.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        thumbnail_path = self.thumbnail_path(digest)
+        if os.path.exists(thumbnail_path):
+            return digest
+
+        image = Image.open(BytesIO(data))
+        extension = (image.format or "img").lower()
+        thumbnail = _card_ready(BytesIO(data), PHOTO_SIZE, DEFAULT_RADIUS)
+
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        write_file(f"{self._base(digest)}.{extension}", data)
+        write_file(thumbnail_path, _png(thumbnail))  # Written last: its presence marks a complete entry
+        return digest
+
+    def put_file(self, path):
+        """
+        Stores the photo file at path and returns its digest.
+        """
+        with open(path, "rb") as f:
+            return self.put(f.read())
+
+    def thumbnail(self, digest, size=PHOTO_SIZE, radius=DEFAULT_RADIUS):
+        """
+        Returns the card-ready photo for digest in a slot of size with
+        corners rounded by radius (None: square), e.g. the template's
+        photo_slot. Thumbnails for other slots than the default are made from
+        the original on first use and kept.
+        """
+        path = self.thumbnail_path(digest, size, radius)
+        if not os.path.exists(path):
+            original = self.original_path(digest)
+            if original is None:
+                raise FileNotFoundError(f"No photo {digest} in {self.root}")
+            thumbnail = _card_ready(original, tuple(size), radius)
+            write_file(path, _png(thumbnail))
+            return thumbnail
+        with Image.open(path) as image:
+            image.load()
+            return image
@@ -0,0 +1,213 @@
+"""
+Per-stage profiling of card generation.
+
+The stages of a card (photo decode, barcode, background, text, encoding, the
+back side, PDF export, web requests) are wrapped in stage() blocks:
+
+    with stage("photo"):
+        photo = load_photo(path)
+
+While profiling is off, stage() returns one shared do-nothing context
+manager, so an instrumented call costs a function call and a flag check and
+the hooks can stay in production code. Once enable()d, every stage records
+its wall time, the CPU time of its thread and, with memory=True, the bytes
+it left allocated (tracemalloc, which itself slows Python code down a few
+times; its counters are process-wide, so stages running concurrently on
+other threads are counted too). Stages nest; a stage's time includes the
+stages inside it.
+
+Results come out as an aggregated summary (summary(), format_summary()) or as
+a Chrome trace-event file (write_trace()) to open in chrome://tracing or
+https://ui.perfetto.dev. Setting IDCARD_PROFILE turns profiling on for a
+whole run of any front end:
+
+    IDCARD_PROFILE=summary         print a summary table to stderr at exit
+    IDCARD_PROFILE=trace.json      write a Chrome trace to trace.json at exit
+                                   ({pid} in the name is replaced by the PID)
+    IDCARD_PROFILE_MEMORY=1        also trace allocations
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import nullcontext
+
+# Trace events kept in memory; the summary counts every stage regardless
+MAX_EVENTS = 100000
+
+_enabled = False
+_memory = False
+_started_tracemalloc = False
+_events = deque(maxlen=MAX_EVENTS)
+_totals = {}
+_lock = threading.Lock()
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    """
+    One timed run of a stage.
+    """
+
+    __slots__ = ("name", "args", "_wall", "_cpu", "_memory")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self._memory = tracemalloc.get_traced_memory()[0] if _memory else None
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter_ns() - self._wall
+        cpu = time.thread_time() - self._cpu
+        allocated = tracemalloc.get_traced_memory()[0] - self._memory if self._memory is not None else None
+        _record(self.name, self._wall, wall, cpu, allocated, self.args)
+        return False
+
+
+# Function to add one finished stage to the trace and the summary
+def _record(name, start_ns, wall_ns, cpu, allocated, args):
+    event = {
+        "name": name, "cat": "card", "ph": "X", "ts": start_ns / 1000, "dur": wall_ns / 1000,
+        "pid": os.getpid(), "tid": threading.get_ident(),
+        "args": {**args, "cpu_ms": round(cpu * 1000, 3)},
+    }
+    if allocated is not None:
+        event["args"]["alloc_bytes"] = allocated
+    with _lock:
+        _events.append(event)
+        totals = _totals.get(name)
+        if totals is None:
+            totals = _totals[name] = {"count": 0, "wall": 0.0, "max_wall": 0.0, "cpu": 0.0, "alloc_bytes": None}
+        totals["count"] += 1
+        totals["wall"] += wall_ns / 1e9
+        totals["max_wall"] = max(totals["max_wall"], wall_ns / 1e9)
+        totals["cpu"] += cpu
+        if allocated is not None:
+            totals["alloc_bytes"] = (totals["alloc_bytes"] or 0) + allocated
+
+
+def stage(name, **args):
+    """
+    Returns a context manager timing the block as stage name; args are added
+    to its trace event. Does nothing while profiling is off.
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, args)
+
+
+def profiled(name):
+    """
+    Decorator running every call of the function as stage name.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(memory=False):
+    """
+    Starts recording stages; with memory=True allocations are traced too.
+    """
+    global _enabled, _memory, _started_tracemalloc
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _memory = memory
+    _enabled = True
+
+
+def disable():
+    """
+    Stops recording stages. What was recorded is kept until reset().
+    """
+    global _enabled, _memory, _started_tracemalloc
+    _enabled = False
+    _memory = False
+    if _started_tracemalloc:
+        _started_tracemalloc = False
+        tracemalloc.stop()
+
+
+def is_enabled():
+    """
+    Returns whether stages are being recorded.
+    """
+    return _enabled
+
+
+def reset():
+    """
+    Forgets every recorded stage.
+    """
+    with _lock:
+        _events.clear()
+        _totals.clear()
+
+
+def summary():
+    """
+    Returns {stage: totals} with each stage's count, total, mean and
+    longest wall time, total CPU time (in seconds) and bytes left allocated
+    (None unless allocations were traced).
+    """
+    with _lock:
+        return {name: {**totals, "mean_wall": totals["wall"] / totals["count"]}
+                for name, totals in _totals.items()}
+
+
+def format_summary():
+    """
+    Returns the summary as a text table, slowest stage (by total time) first.
+    """
+    rows = sorted(summary().items(), key=lambda item: item[1]["wall"], reverse=True)
+    lines = [f"{'stage':<16}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}{'cpu ms':>10}{'alloc KB':>11}"]
+    for name, totals in rows:
+        allocated = f"{totals['alloc_bytes'] / 1024:.1f}" if totals["alloc_bytes"] is not None else "-"
+        lines.append(f"{name:<16}{totals['count']:>8}{totals['wall'] * 1000:>12.1f}{totals['mean_wall'] * 1000:>10.2f}"
+                     f"{totals['max_wall'] * 1000:>10.2f}{totals['cpu'] * 1000:>10.1f}{allocated:>11}")
+    return "\n".join(lines)
+
+
+def write_trace(path):
+    """
+    Writes the recorded stages to path as a Chrome trace-event JSON file and
+    returns the path.
+    """
+    with _lock:
+        events = list(_events)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+# Function to report at exit, as asked for by IDCARD_PROFILE; processes that
+# recorded nothing (e.g. Flask's reloader) stay quiet
+def _report(target):
+    if not _totals:
+        return
+    if target == "summary":
+        print(format_summary(), file=sys.stderr)
+    else:
+        print(f"Profile trace written to {write_trace(target.format(pid=os.getpid()))}", file=sys.stderr)
+
+
+if os.environ.get("IDCARD_PROFILE"):
+    enable(memory=os.environ.get("IDCARD_PROFILE_MEMORY", "0") != "0")
+    atexit.register(_report, os.environ["IDCARD_PROFILE"])
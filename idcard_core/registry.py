@@ -0,0 +1,292 @@
+"""
+Registry of issued cards.
+
+Every card is recorded in SQLite when it is issued: its ID, the member's name
+and details, the layout, issue and expiry dates, the value its barcode
+encodes and where its sides were saved. Without it the only record of a card
+is its id_card_front_<id>.png file.
+
+    registry = open_registry()
+    registry.get("123456789")
+    registry.find_by_name("som")          # Case-insensitive name prefix
+    registry.expiring(30)                 # Cards expiring in the next 30 days
+    registry.lookup_barcode("*123456789*")
+
+Each card is one row written in a single transaction, so a crash never
+leaves a half-recorded card. Lookups by ID, name prefix, expiry window and
+barcode are index range scans (dates are stored as ISO strings and names
+casefolded for this), which keeps them in the millisecond range with millions
+of cards; see benchmarks/bench_registry.py.
+
+    python -m idcard_core.registry find som
+    python -m idcard_core.registry expiring 30
+    python -m idcard_core.registry import cards/manifest.jsonl   # cards issued before the registry
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from idcard_core.ids import DATA_DIR
+
+# Shared by every front end, whatever directory it runs from, like the ID store
+DEFAULT_REGISTRY = os.environ.get("IDCARD_REGISTRY", os.path.join(DATA_DIR, "card_registry.sqlite3"))
+
+# Columns returned for a card, in order
+COLUMNS = ("id", "full_name", "layout", "issue_date", "expiry_date", "barcode", "front", "back", "fields", "issued_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    layout TEXT,
+    issue_date TEXT,
+    expiry_date TEXT,
+    barcode TEXT,
+    front TEXT,
+    back TEXT,
+    fields TEXT NOT NULL,
+    issued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cards_name ON cards (name_key, id);
+CREATE INDEX IF NOT EXISTS cards_expiry ON cards (expiry_date, id);
+CREATE INDEX IF NOT EXISTS cards_barcode ON cards (barcode);
+"""
+
+
+# Function to turn a date, datetime or ISO string into an ISO date string
+def _iso_date(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+# Function to normalise a scanned Code39 value: scanners may include the
+# start/stop asterisks and the symbology only carries upper case
+def normalise_barcode(value):
+    return str(value).strip().strip("*").upper()
+
+
+class CardRegistry:
+    """
+    The issued-card registry in the SQLite file at path. One registry can be
+    shared by threads; each process should open its own (see open_registry).
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")  # Still atomic; skips an fsync per card
+        self._connection.executescript(SCHEMA)
+
+    # Function to run statements in one committed transaction
+    def _write(self, statement, rows):
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = connection.executemany(statement, rows)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            rows = self._connection.execute(sql, parameters).fetchall()
+        cards = []
+        for row in rows:
+            card = dict(zip(COLUMNS, row))
+            card["fields"] = json.loads(card["fields"])
+            cards.append(card)
+        return cards
+
+    def record(self, card_id, full_name, issue_date=None, expiry_date=None, layout=None, barcode=None,
+               front=None, back=None, fields=None):
+        """
+        Records an issued card. Dates are date objects or ISO strings; fields
+        are the member details printed on the card (non-text values such as
+        in-memory photos are left out). Raises sqlite3.IntegrityError if the
+        ID is already registered.
+        """
+        self.record_many([{
+            "id": card_id, "full_name": full_name, "issue_date": issue_date, "expiry_date": expiry_date,
+            "layout": layout, "barcode": barcode, "front": front, "back": back, "fields": fields,
+        }])
+
+    def record_many(self, cards):
+        """
+        Records several cards (dicts with the arguments of record()) in one
+        transaction; either all of them are registered or none.
+        """
+        rows = []
+        now = time.time()
+        for card in cards:
+            fields = {name: value for name, value in (card.get("fields") or {}).items() if isinstance(value, str)}
+            barcode = card.get("barcode")
+            rows.append((
+                str(card["id"]), card["full_name"], card["full_name"].casefold(), card.get("layout"),
+                _iso_date(card.get("issue_date")), _iso_date(card.get("expiry_date")),
+                normalise_barcode(barcode) if barcode is not None else None,
+                card.get("front"), card.get("back"), json.dumps(fields, sort_keys=True), card.get("issued_at", now),
+            ))
+        return self._write(
+            "INSERT INTO cards (id, full_name, name_key, layout, issue_date, expiry_date, barcode, front, back, "
+            "fields, issued_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def renew(self, card_id, issue_date, expiry_date, fields=None):
+        """
+        Records new dates for a re-dated card and, if given, the member fields
+        it now prints; returns False if the ID is not registered.
+        """
+        dates = (_iso_date(issue_date), _iso_date(expiry_date))
+        if fields is None:
+            return self._write("UPDATE cards SET issue_date = ?, expiry_date = ? WHERE id = ?",
+                               [dates + (str(card_id),)]) > 0
+        full_name = fields.get("full_name")
+        fields = {name: value for name, value in fields.items() if isinstance(value, str)}
+        return self._write(
+            "UPDATE cards SET issue_date = ?, expiry_date = ?, fields = ?, full_name = COALESCE(?, full_name), "
+            "name_key = COALESCE(?, name_key) WHERE id = ?",
+            [dates + (json.dumps(fields, sort_keys=True), full_name, full_name and full_name.casefold(),
+                      str(card_id))]) > 0
+
+    def get(self, card_id):
+        """
+        Returns the card with this ID as a dict, or None.
+        """
+        cards = self._query(f"SELECT {', '.join(COLUMNS)} FROM cards WHERE id = ?", (str(card_id),))
+        return cards[0] if cards else None
+
+    def find_by_name(self, prefix, limit=50):
+        """
+        Returns up to limit cards whose member name starts with prefix,
+        ignoring case, ordered by name.
+        """
+        key = prefix.casefold()
+        # A range on the casefolded name, so the index is used (LIKE would scan)
+        return self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM cards WHERE name_key >= ? AND name_key < ? ORDER BY name_key, id LIMIT ?",
+            (key, key + "\U0010ffff", limit))
+
+    def expiring(self, days, today=None, limit=None):
+        """
+        Returns the cards expiring within the next days days (today
+        included), soonest first, e.g. for a renewal batch.
+        """
+        today = today or date.today()
+        sql = f"SELECT {', '.join(COLUMNS)} FROM cards WHERE expiry_date BETWEEN ? AND ? ORDER BY expiry_date, id"
+        parameters = (_iso_date(today), _iso_date(today + timedelta(days=days)))
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters += (limit,)
+        return self._query(sql, parameters)
+
+    def lookup_barcode(self, value):
+        """
+        Returns the card whose barcode encodes value (as scanned), or None.
+        """
+        cards = self._query(f"SELECT {', '.join(COLUMNS)} FROM cards WHERE barcode = ?", (normalise_barcode(value),))
+        return cards[0] if cards else None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def open_registry(path=None):
+    """
+    Returns the process-wide registry for path (default: DEFAULT_REGISTRY).
+    """
+    key = (os.getpid(), os.path.abspath(path or DEFAULT_REGISTRY))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = CardRegistry(key[1])
+            _registries[key] = registry
+    return registry
+
+
+# Function to print cards one per line
+def _print_cards(cards):
+    for card in cards:
+        print(f"{card['id']}  {card['full_name']:<30}  expires {card['expiry_date'] or '-':<10}  {card['front'] or ''}")
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Look up issued cards")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY, help="Registry path")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("get", help="Show the card with an ID").add_argument("id")
+    find_parser = subparsers.add_parser("find", help="Find cards by member name prefix")
+    find_parser.add_argument("prefix")
+    find_parser.add_argument("--limit", type=int, default=50)
+    expiring_parser = subparsers.add_parser("expiring", help="List cards expiring in the next days")
+    expiring_parser.add_argument("days", type=int)
+    subparsers.add_parser("barcode", help="Find the card a scanned barcode belongs to").add_argument("value")
+    import_parser = subparsers.add_parser("import", help="Register the cards listed in batch manifests")
+    import_parser.add_argument("manifests", nargs="+", help="manifest.jsonl files written by idcard_core.batch")
+    import_parser.add_argument("--layout", default="kdo", help="Layout the cards were rendered with (default: kdo)")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+    registry = CardRegistry(args.registry)
+    try:
+        if args.command == "get":
+            card = registry.get(args.id)
+            if card is None:
+                print(f"No card {args.id}", file=sys.stderr)
+                return 1
+            print(json.dumps(card, indent=2))
+        elif args.command == "find":
+            _print_cards(registry.find_by_name(args.prefix, args.limit))
+        elif args.command == "expiring":
+            _print_cards(registry.expiring(args.days))
+        elif args.command == "barcode":
+            card = registry.lookup_barcode(args.value)
+            if card is None:
+                print(f"No card with barcode {args.value}", file=sys.stderr)
+                return 1
+            _print_cards([card])
+        else:
+            # Imported here: the lookups above should not load the renderer
+            from idcard_core.batch import manifest_entry, read_manifest
+            from idcard_core.renderer import CardRenderer
+
+            renderer = CardRenderer(args.layout)
+            cards = []
+            for manifest in args.manifests:
+                for record in read_manifest(manifest).values():
+                    if record.get("id") and registry.get(record["id"]) is None:
+                        cards.append(manifest_entry(renderer, record))
+            registry.record_many(cards)
+            print(f"Registered {len(cards)} cards in {args.registry}")
+    finally:
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+The card rendering engine shared by every front end.
+
+A CardRenderer renders one kind of card, described by a layout template (see
+idcard_core.templates), and is all a front end needs: the Tkinter apps, the
+Flask app, the batch command and the amatak workers only collect member data
+and show or serve the result.
+
+    renderer = CardRenderer("kdo")
+    renderer.preload()                        # Optional: fonts, background, back side
+    card = renderer.render(full_name="...", dob="...", position="...", address="...",
+                           photo_path="member.jpg", front_path="front.png", back_dir="cards")
+    renderer.write_pdf(card, "card.pdf")
+
+Everything expensive lives in process-wide caches behind it: compiled
+templates, fonts, background templates, corner masks, the rendered back
+sides and the render thread pool. Any number of renderers can be created
+cheaply and every front end benefits from the same caching and parallelism.
+
+Card IDs come from the persistent ID store (idcard_core.ids) and are
+ID_DIGITS digits long for every kind of card. Every card rendered with
+render() or render_async() is recorded in the card registry
+(idcard_core.registry) once its files are written.
+"""
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from idcard_core.artifact import render_card_async
+from idcard_core.backs import back_side_image
+from idcard_core.encoding import DEFAULT_PROFILE
+from idcard_core.ids import generate_id
+from idcard_core.profiling import profiled
+from idcard_core.registry import open_registry
+from idcard_core.templates import ASSETS_DIR, load_card_template
+
+# Length of every card ID
+ID_DIGITS = 9
+
+# Fields a renderer fills in itself when the caller leaves them out
+ISSUED_FIELDS = ("id_number", "issue_date", "validity_date")
+
+
+class CardRenderer:
+    """
+    Renders the cards of one layout template. id_store is the ID store to
+    allocate from (default: idcard_core.ids.DEFAULT_STORE), registry the card
+    registry to record issued cards in (default:
+    idcard_core.registry.DEFAULT_REGISTRY; register=False records nothing)
+    and profile the output encoding of saved fronts (see
+    idcard_core.encoding).
+    """
+
+    def __init__(self, layout="kdo", assets_dir=ASSETS_DIR, id_store=None, profile=DEFAULT_PROFILE, registry=None,
+                 register=True):
+        self.template = load_card_template(layout, assets_dir)
+        self.size = self.template.size
+        self.back_spec = self.template.back_spec
+        self.id_store = id_store
+        self.profile = profile
+        self.registry = registry
+        self.register = register
+
+    @property
+    def fields(self):
+        """
+        Member fields the caller has to supply (the rest are issued here).
+        """
+        return [field for field in self.template.fields if field not in ISSUED_FIELDS]
+
+    def preload(self):
+        """
+        Loads the fonts, renders the front background and the back side and
+        imports the barcode writer now rather than on the first card. Front
+        ends call it at startup, ideally off their main thread.
+        """
+        self.template.preload()
+        if self.back_spec is not None:
+            back_side_image(self.back_spec)
+        import barcode.writer  # noqa: F401  (imported lazily by idcard_core.barcodes)
+
+    def new_id(self):
+        """
+        Returns a new card ID from the persistent ID store.
+        """
+        return generate_id(digits=ID_DIGITS, path=self.id_store)
+
+    def card_dates(self, today=None):
+        """
+        Returns (issue_date, validity_date) of a card issued today, formatted
+        as the layout prints them.
+        """
+        today = today or datetime.now()
+        validity = today + timedelta(days=self.template.validity_days)
+        return today.strftime(self.template.date_format), validity.strftime(self.template.date_format)
+
+    def issue(self, **fields):
+        """
+        Returns fields completed with a new ID and today's dates, for those
+        the layout uses and the caller did not give.
+        """
+        fields = dict(fields)
+        if "id_number" in self.template.fields and "id_number" not in fields:
+            fields["id_number"] = self.new_id()
+        if "issue_date" not in fields or "validity_date" not in fields:
+            issue_date, validity_date = self.card_dates()
+            fields.setdefault("issue_date", issue_date)
+            fields.setdefault("validity_date", validity_date)
+        return {field: value for field, value in fields.items() if field in self.template.fields}
+
+    def parse_date(self, value):
+        """
+        Returns a date printed on the card (in the layout's date_format) as a
+        date, or None.
+        """
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, self.template.date_format).date()
+        except ValueError:
+            return None
+
+    def registry_entry(self, fields, front=None, back=None):
+        """
+        Returns the registry record (see idcard_core.registry) of the card
+        issued with fields, saved at front and back.
+        """
+        barcode_field = self.template.barcode_field
+        return {
+            "id": fields["id_number"],
+            "full_name": fields.get("full_name", ""),
+            "layout": self.template.name,
+            "issue_date": self.parse_date(fields.get("issue_date")),
+            "expiry_date": self.parse_date(fields.get("validity_date")),
+            "barcode": fields.get(barcode_field) if barcode_field else None,
+            "front": front,
+            "back": back,
+            "fields": {name: value for name, value in fields.items() if name not in ISSUED_FIELDS},
+        }
+
+    def front_layers(self, base=None, **fields):
+        """
+        Returns the front as a LayeredCard (see idcard_core.layers); base is
+        an already rendered front to update instead of compositing it again.
+        """
+        return self.template.front_layers(base=base, **fields)
+
+    @profiled("card_front")
+    def render_front(self, **fields):
+        """
+        Returns the rendered front of a card with the given fields.
+        """
+        return self.template.render_front(**fields)
+
+    @profiled("card_back")
+    def render_back(self):
+        """
+        Returns a copy of the shared back side, or None for a single-sided
+        card.
+        """
+        return back_side_image(self.back_spec) if self.back_spec is not None else None
+
+    def renew_front(self, front, old_dates, new_dates, changes=None, **fields):
+        """
+        Re-dates an already rendered front (printed with fields) in place,
+        redrawing only the two date lines and the fields given new values in
+        changes, and returns it.
+        """
+        card = self.front_layers(base=front, **fields, issue_date=old_dates[0], validity_date=old_dates[1])
+        card.update(**(changes or {}), issue_date=new_dates[0], validity_date=new_dates[1])
+        return card.image
+
+    def render_async(self, front_path=None, back_dir=None, profile=None, **fields):
+        """
+        Issues a card (see issue()) and renders, encodes and optionally saves
+        both sides concurrently, then records it in the registry. Returns a
+        Future resolving to the CardArtifact; its fields are the card's
+        completed fields.
+        """
+        fields = self.issue(**fields)
+        if front_path is not None:
+            front_path = front_path.format(**fields)
+        rendered = render_card_async(fields.get("id_number"), self.front_layers(**fields), self.back_spec,
+                                     front_path=front_path, back_dir=back_dir, profile=profile or self.profile)
+
+        # Resolved only once the card is registered, so a waiter never sees an unrecorded card
+        future = Future()
+
+        def done(_):
+            if rendered.exception() is not None:
+                future.set_exception(rendered.exception())
+                return
+            card = rendered.result()
+            card.fields = fields
+            if self.register and "id_number" in fields:
+                try:
+                    entry = self.registry_entry(fields, card.paths.get("front"), card.paths.get("back"))
+                    open_registry(self.registry).record_many([entry])
+                except Exception as e:
+                    future.set_exception(e)
+                    return
+            future.set_result(card)
+
+        rendered.add_done_callback(done)
+        return future
+
+    def render(self, front_path=None, back_dir=None, profile=None, **fields):
+        """
+        Like render_async(), but waits for the card and returns it.
+        """
+        return self.render_async(front_path, back_dir, profile, **fields).result()
+
+    @profiled("pdf")
+    def write_pdf(self, card, pdf_path):
+        """
+        Writes both sides of card (a CardArtifact) to an A4 PDF at half size,
+        straight from the in-memory images, and returns the path.
+        """
+        from reportlab.lib.pagesizes import A4  # Imported on first export, it is slow to load
+        from reportlab.pdfgen import canvas
+
+        width, height = self.size[0] // 2, self.size[1] // 2
+        c = canvas.Canvas(pdf_path, pagesize=A4)
+        c.drawImage(card.image_reader("front"), 50, 700, width=width, height=height)
+        if card.image("back") is not None:
+            c.drawImage(card.image_reader("back"), 50, 400, width=width, height=height)
+        c.save()
+        return pdf_path
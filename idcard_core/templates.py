@@ -0,0 +1,244 @@
+"""
+Declarative card layouts.
+
+A layout template describes both sides of a card in JSON (or YAML, when
+PyYAML is installed): the card size, background images, the photo slot, the
+barcode and text runs. Text containing a {field} placeholder is filled per
+card; text without one is static. Bundled templates live in
+idcard_core/layouts/ and are loaded by name:
+
+    {
+        "name": "kdo",
+        "size": [1010, 637],
+        "front": {
+            "background": "front_background.jpg",   # relative to images/
+            "radius": 30,                           # null keeps square corners
+            "photo": {"position": [50, 50], "size": [200, 200], "radius": 20},
+            "text": [{"position": [300, 60], "text": "Name: {full_name}", "size": 28}],
+            "barcode": {"position": [50, 300], "size": [200, 50], "field": "id_number"}
+        },
+        "back": {
+            "background": "back_background.jpg",
+            "rectangles": [{"box": [0, 50, 1010, 100], "fill": "black"}],
+            "text": [{"position": [50, 15], "text": "Terms of Use:", "size": 28}]
+        }
+    }
+
+Text runs take an optional "font" (default arial.ttf) and "fill" (default
+white). A side without a "background" image is filled with its "color"
+(default white), and "back" may be left out for single-sided cards.
+"validity_days" and "date_format" (strftime) set the dates printed on a card
+issued today (see idcard_core.renderer).
+
+A template is compiled once per process into a CardTemplate: fonts
+are loaded, the front background is resized, rounded and has the static text
+drawn on it, and the back becomes a spec for the shared back-side cache. A
+card then only draws its photo, barcode and dynamic text.
+"""
+import json
+import os
+import string
+import threading
+
+from PIL import Image, ImageDraw
+
+from idcard_core.assets import load_template
+from idcard_core.barcodes import BARCODE_SIZE, render_barcode
+from idcard_core.fonts import get_font, preload_fonts
+from idcard_core.imaging import round_corners
+from idcard_core.layers import ImageLayer, LayeredCard, TextLayer
+from idcard_core.photos import PHOTO_SIZE, card_photo
+from idcard_core.profiling import stage
+
+# Bundled templates, loaded by name
+LAYOUTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts")
+
+# Background images live in images/ at the repository root
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+DEFAULT_FONT = "arial.ttf"
+DEFAULT_FILL = "white"
+DEFAULT_VALIDITY_DAYS = 365
+DEFAULT_DATE_FORMAT = "%d-%m-%Y"
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+# Function to split "Label: {field}" into a one-placeholder format string and
+# the field name; static text gives (text, None)
+def _parse_text(text):
+    parts = []
+    fields = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(text):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            fields.append(field)
+            parts.append("{" + (f"!{conversion}" if conversion else "") + (f":{format_spec}" if format_spec else "") + "}")
+    if not fields:
+        return text, None
+    if len(fields) > 1 or not fields[0]:
+        raise ValueError(f"Text run {text!r} must have exactly one named field")
+    return "".join(parts), fields[0]
+
+
+# Function to read a template file, JSON or YAML by extension
+def _read_spec(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(f"PyYAML is required to read {path}; install it or use a JSON template") from None
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class CardTemplate:
+    """
+    A compiled layout template: the draw plan for one kind of card.
+    """
+
+    def __init__(self, spec, assets_dir=ASSETS_DIR):
+        self.name = spec.get("name", "card")
+        self.size = tuple(spec["size"])
+        self.validity_days = spec.get("validity_days", DEFAULT_VALIDITY_DAYS)
+        self.date_format = spec.get("date_format", DEFAULT_DATE_FORMAT)
+        front = spec["front"]
+        back = spec.get("back")
+
+        self._front_background = os.path.join(assets_dir, front["background"]) if front.get("background") else None
+        self._front_color = front.get("color", "white")
+        self._front_radius = front.get("radius")
+        self._front_rectangles = [(tuple(r["box"]), r["fill"]) for r in front.get("rectangles", ())]
+        self._static_text = []
+        self._dynamic_text = []
+        for run in front.get("text", ()):
+            template, field = _parse_text(run["text"])
+            entry = (tuple(run["position"]), template, run.get("font", DEFAULT_FONT), run["size"], field, run.get("fill", DEFAULT_FILL))
+            (self._dynamic_text if field else self._static_text).append(entry)
+
+        photo = front.get("photo")
+        self._photo = None
+        # (size, corner radius) of the photo slot, e.g. to pick a PhotoStore thumbnail; None without a photo
+        self.photo_slot = None
+        if photo:
+            self._photo = (tuple(photo["position"]), tuple(photo.get("size", PHOTO_SIZE)), photo.get("radius", 20))
+            self.photo_slot = self._photo[1:]
+
+        barcode = front.get("barcode")
+        self._barcode = None
+        self.barcode_field = None
+        if barcode:
+            fill = barcode.get("fill", (255, 255, 255))
+            self._barcode = (tuple(barcode["position"]), tuple(barcode.get("size", BARCODE_SIZE)), barcode.get("field", "id_number"),
+                             tuple(fill) if fill is not None else None)
+            self.barcode_field = self._barcode[2]
+
+        # Spec for the shared back-side cache (idcard_core.backs); None for single-sided cards
+        self.back_spec = None
+        if back is not None:
+            self.back_spec = {
+                "background": os.path.join(assets_dir, back["background"]) if back.get("background") else None,
+                "size": self.size,
+                "radius": back.get("radius"),
+                "rectangles": [(tuple(r["box"]), r["fill"]) for r in back.get("rectangles", ())],
+                "text": [(tuple(run["position"]), run["text"], run.get("font", DEFAULT_FONT), run["size"]) for run in back.get("text", ())],
+            }
+            for name in ("fill", "color"):
+                if name in back:
+                    self.back_spec[name] = back[name]
+
+        back_text = self.back_spec["text"] if self.back_spec else []
+        self.fonts = sorted({(font, size) for _, _, font, size, _, _ in self._static_text + self._dynamic_text}
+                            | {(font, size) for _, _, font, size in back_text})
+        self.fields = []
+        for field in ([self._photo and "photo_path"] + [entry[4] for entry in self._dynamic_text]
+                      + [self._barcode and self._barcode[2]]):
+            if field and field not in self.fields:
+                self.fields.append(field)
+        self._base = None
+        self._base_lock = threading.Lock()
+
+    def preload(self):
+        """
+        Loads the fonts and renders the front background now rather than on
+        the first card.
+        """
+        preload_fonts(self.fonts)
+        self._front_base()
+
+    # Function to render the front background with its static content, once
+    def _front_base(self, _=None):
+        with self._base_lock:
+            if self._base is None:
+                with stage("background", template=self.name):
+                    if self._front_background:
+                        base = load_template(self._front_background, self.size, radius=self._front_radius)
+                    else:
+                        base = Image.new("RGB", self.size, self._front_color)
+                        if self._front_radius is not None:
+                            base = round_corners(base, radius=self._front_radius)
+                    draw = ImageDraw.Draw(base)
+                    for box, color in self._front_rectangles:
+                        draw.rectangle(box, fill=color)
+                    for position, text, font, size, _, fill in self._static_text:
+                        draw.text(position, text, fill=fill, font=get_font(font, size))
+                self._base = base
+            return self._base
+
+    def front_layers(self, base=None, **fields):
+        """
+        Returns the front of a card with the given field values as a
+        LayeredCard (see idcard_core.layers); base is an already rendered
+        front to update instead of compositing it again.
+        """
+        missing = [field for field in self.fields if field not in fields]
+        if missing:
+            raise TypeError(f"{self.name} card needs {', '.join(missing)}")
+
+        layers = []
+        if self._photo:
+            position, size, radius = self._photo
+            layers.append(ImageLayer(position, size, lambda photo, radius=radius, size=size: card_photo(photo, radius, size),
+                                     field="photo_path", value=fields["photo_path"]))
+        for position, template, font, size, field, fill in self._dynamic_text:
+            layers.append(TextLayer(position, template, font, size, field=field, value=fields[field], fill=fill))
+        if self._barcode:
+            position, size, field, fill = self._barcode
+            layers.append(ImageLayer(position, size, lambda value, size=size, fill=fill: render_barcode(value, size, fill),
+                                     field=field, value=fields[field]))
+        background = ImageLayer((0, 0), self.size, self._front_base)
+        return LayeredCard(background, layers, base=base)
+
+    def render_front(self, **fields):
+        """
+        Returns the rendered front of a card with the given field values.
+        """
+        return self.front_layers(**fields).image
+
+
+def load_card_template(name, assets_dir=ASSETS_DIR):
+    """
+    Returns the compiled template called name (a bundled layout such as
+    "kdo" or "card_belongs_to") or stored at a path, with its background
+    images looked up in assets_dir. Templates are compiled once per process
+    and shared.
+    """
+    path = name
+    if not os.path.exists(path):
+        for extension in (".json", ".yaml", ".yml"):
+            candidate = os.path.join(LAYOUTS_DIR, name + extension)
+            if os.path.exists(candidate):
+                path = candidate
+                break
+        else:
+            raise FileNotFoundError(f"No card template called {name!r} in {LAYOUTS_DIR}")
+    key = (os.path.abspath(path), os.path.abspath(assets_dir))
+
+    with _lock:
+        template = _compiled.get(key)
+        if template is None:
+            template = CardTemplate(_read_spec(key[0]), assets_dir)
+            _compiled[key] = template
+    return template
@@ -0,0 +1,94 @@
+"""
+Background work for the Tkinter front ends.
+
+Rendering a card or writing a PDF on the Tk main thread freezes the window.
+TkWorker runs such jobs on a RenderQueue (idcard_core.jobs) instead and polls
+for finished jobs with root.after, so callbacks still run on the main thread,
+where Tk widgets may be touched. While jobs are queued or running, a status
+line and an indeterminate progress bar show how many are left, and the
+operator can keep entering the next member.
+"""
+from tkinter import StringVar, ttk
+
+from idcard_core.jobs import RenderQueue
+
+
+class TkWorker:
+    """
+    Runs jobs off the Tk main loop and reports back on it. Jobs run one at a
+    time, in the order submitted, unless workers is raised.
+    """
+
+    def __init__(self, root, workers=1, max_pending=16, poll_ms=100):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.status = StringVar(root, value="Ready")
+        self._idle_text = "Ready"
+        self._queue = RenderQueue(workers=workers, max_pending=max_pending)
+        self._jobs = {}
+        self._polling = False
+        self._progress = None
+
+    def widgets(self, parent):
+        """
+        Creates the status line and progress bar in parent and returns them
+        as (label, progressbar) for the caller to lay out.
+        """
+        label = ttk.Label(parent, textvariable=self.status)
+        self._progress = ttk.Progressbar(parent, mode="indeterminate", length=200)
+        return label, self._progress
+
+    def submit(self, func, *args, on_done=None, on_error=None, description="Working"):
+        """
+        Queues func(*args). on_done(result) or on_error(message) is called on
+        the Tk main thread when it finishes. Raises QueueFull when too many
+        jobs are waiting.
+        """
+        job_id = self._queue.submit(func, *args)
+        self._jobs[job_id] = (on_done, on_error, description)
+        self._update_status()
+        if not self._polling:
+            self._polling = True
+            if self._progress is not None:
+                self._progress.start(10)
+            self.root.after(self.poll_ms, self._poll)
+        return job_id
+
+    def report(self, text):
+        """
+        Sets the message shown once no jobs are left, e.g. where the last
+        card was saved.
+        """
+        self._idle_text = text
+        if not self._jobs:
+            self.status.set(text)
+
+    def _poll(self):
+        for job_id, (on_done, on_error, _) in list(self._jobs.items()):
+            job = self._queue.status(job_id)
+            if job is not None and job["status"] in ("queued", "running"):
+                continue
+            del self._jobs[job_id]
+            self._queue.forget(job_id)  # Delivered below; finished cards are large
+            if job is None:
+                if on_error is not None:
+                    on_error("The job was lost")
+            elif job["status"] == "done":
+                if on_done is not None:
+                    on_done(job["result"])
+            elif on_error is not None:
+                on_error(job["error"])
+
+        if self._jobs:
+            self._update_status()
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+            if self._progress is not None:
+                self._progress.stop()
+            self.status.set(self._idle_text)
+
+    def _update_status(self):
+        descriptions = [description for _, _, description in self._jobs.values()]
+        waiting = f" ({len(descriptions) - 1} more waiting)" if len(descriptions) > 1 else ""
+        self.status.set(f"{descriptions[0]}...{waiting}")
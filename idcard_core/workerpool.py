@@ -0,0 +1,331 @@
+"""
+Supervised pool of warm render worker processes.
+
+Starting a Python interpreter and importing Pillow, python-barcode and the
+card templates costs far more than rendering one card. WorkerPool starts its
+worker processes once, warms them up (imports, fonts, templates) and then
+hands them calls over a pipe. A supervisor thread pings idle workers and
+restarts any that died or stopped answering; a worker is also replaced after
+max_requests calls, so a slow leak cannot grow without bound.
+
+    pool = WorkerPool(size=2, max_requests=500)
+    pool.start()
+    record = pool.call("idcard_core.batch:render_member", member, "cards")
+    pool.status()   # One dict per worker: state, pid, requests, throughput
+"""
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+# Warm-up run in every worker before it takes calls
+DEFAULT_WARM_UP = "idcard_core.workerpool:warm_up"
+
+
+class WorkerError(Exception):
+    """
+    Raised by WorkerPool.call() when the called function raised, the worker
+    crashed or did not answer in time.
+    """
+
+
+# Function to resolve "package.module:function" to the function
+def _resolve(path):
+    module_name, _, name = path.partition(":")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def warm_up():
+    """
+    Loads what every card render needs: the renderer modules, the layout
+    templates and their fonts.
+    """
+    import barcode.writer  # noqa: F401  (imported lazily by idcard_core.barcodes)
+    from idcard_core.templates import load_card_template
+
+    for name in ("kdo", "card_belongs_to"):
+        load_card_template(name).preload()
+
+
+# Function run in each worker process: warm up, then serve calls until told to stop
+def _serve(conn, warm_up_path):
+    if warm_up_path:
+        _resolve(warm_up_path)()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        if message[0] == "ping":
+            conn.send(("pong", os.getpid()))
+            continue
+        _, function_path, args, kwargs = message
+        try:
+            conn.send(("ok", _resolve(function_path)(*args, **kwargs)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """
+    One slot of the pool and the process currently serving it.
+    """
+
+    def __init__(self, number):
+        self.number = number
+        self.lock = threading.Lock()
+        self.process = None
+        self.conn = None
+        self.state = "stopped"
+        self.requests = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_restart_reason = None
+        self.busy_seconds = 0.0
+        self.started = None
+        self.last_health = None
+
+
+class WorkerPool:
+    """
+    A fixed number of warm worker processes, supervised and recycled.
+    """
+
+    def __init__(self, size=2, max_requests=500, health_interval=10, health_timeout=5, start_timeout=60,
+                 warm_up=DEFAULT_WARM_UP):
+        self.size = size
+        self.max_requests = max_requests
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.start_timeout = start_timeout
+        self.warm_up = warm_up
+        # Fresh interpreters: forking a threaded web server is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(number) for number in range(size)]
+        self._idle = queue.Queue()
+        self._running = False
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._supervisor = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """
+        Starts and warms up every worker, then the supervisor. Returns False
+        if the pool was already running.
+        """
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        # The previous run's supervisor must be gone before a new one starts
+        if self._supervisor is not None:
+            self._supervisor.join()
+        self._stopped = threading.Event()
+        for worker in self._workers:
+            # A worker that failed to start is still queued: call() restarts it
+            with worker.lock:
+                self._spawn(worker)
+            self._idle.put(worker)
+        self._supervisor = threading.Thread(target=self._supervise, args=(self._stopped,), name="worker-supervisor",
+                                            daemon=True)
+        self._supervisor.start()
+        return True
+
+    def stop(self):
+        """
+        Stops every worker (waiting for calls in progress) and the supervisor.
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._stopped.set()
+        for worker in self._workers:
+            with worker.lock:
+                self._retire(worker)
+                worker.state = "stopped"
+        # Emptied so the next start() queues every worker exactly once
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+
+    # Function to start a fresh process for worker and wait until it is warm
+    def _spawn(self, worker):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_serve, args=(child_conn, self.warm_up),
+                                        name=f"card-worker-{worker.number}", daemon=True)
+        worker.state = "starting"
+        try:
+            process.start()
+        except OSError:
+            parent_conn.close()
+            child_conn.close()
+            worker.state = "failed"
+            return
+        child_conn.close()
+        worker.process, worker.conn = process, parent_conn
+        worker.requests = 0
+        worker.busy_seconds = 0.0
+        worker.started = time.time()
+        try:
+            # A worker that dies while warming up closes the pipe: poll() is True, recv() raises
+            ready = parent_conn.poll(self.start_timeout) and parent_conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            ready = False
+        if ready:
+            worker.state = "idle"
+            worker.last_health = time.time()
+        else:
+            worker.state = "failed"
+
+    # Function to stop worker's process, politely first
+    def _retire(self, worker):
+        if worker.process is None:
+            return
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+        worker.process = worker.conn = None
+
+    # Function to replace worker's process with a new one
+    def _restart(self, worker, reason):
+        self._retire(worker)
+        worker.restarts += 1
+        worker.last_restart_reason = reason
+        if self._running:
+            self._spawn(worker)
+
+    def call(self, function_path, *args, timeout=None, **kwargs):
+        """
+        Runs function_path ("package.module:function") with args in the next
+        free worker and returns its result. Raises WorkerError if it raised,
+        the worker crashed or no answer came within timeout seconds.
+        """
+        if not self._running:
+            raise WorkerError("The worker pool is not running")
+        stopped = self._stopped
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                try:
+                    worker = self._idle.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if stopped.is_set():
+                        raise WorkerError("The worker pool was stopped") from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with worker.lock:
+            try:
+                if worker.state != "idle":
+                    self._restart(worker, "not ready")
+                    if worker.state != "idle":
+                        raise WorkerError(f"Worker {worker.number} could not be started")
+                worker.state = "busy"
+                started = time.monotonic()
+                try:
+                    worker.conn.send(("call", function_path, args, kwargs))
+                    if not worker.conn.poll(timeout):
+                        self._restart(worker, "timed out")
+                        raise WorkerError(f"Worker {worker.number} did not answer within {timeout} s")
+                    status, result = worker.conn.recv()
+                except (EOFError, OSError) as e:
+                    worker.failures += 1
+                    self._restart(worker, "crashed")
+                    raise WorkerError(f"Worker {worker.number} crashed: {e}") from None
+                worker.busy_seconds += time.monotonic() - started
+                worker.requests += 1
+                worker.total_requests += 1
+                worker.state = "idle"
+                if worker.requests >= self.max_requests:
+                    self._restart(worker, "recycled")
+                if status == "error":
+                    worker.failures += 1
+                    raise WorkerError(result)
+                return result
+            finally:
+                # Returned under its lock, so stop() drains it; after stop() it is not queued again
+                if not stopped.is_set():
+                    self._idle.put(worker)
+
+    # Function run by the supervisor thread: health-check idle workers until stopped is set
+    def _supervise(self, stopped):
+        while not stopped.wait(self.health_interval):
+            for worker in self._workers:
+                if stopped.is_set():
+                    return
+                if not worker.lock.acquire(blocking=False):
+                    continue  # Busy with a call, which checks it anyway
+                try:
+                    if worker.process is None or not worker.process.is_alive():
+                        self._restart(worker, "died")
+                        continue
+                    try:
+                        worker.conn.send(("ping",))
+                        healthy = worker.conn.poll(self.health_timeout) and worker.conn.recv()[0] == "pong"
+                    except (EOFError, OSError):
+                        healthy = False
+                    if healthy:
+                        worker.last_health = time.time()
+                    else:
+                        self._restart(worker, "failed health check")
+                finally:
+                    worker.lock.release()
+
+    def depth(self):
+        """
+        Returns the number of calls waiting for a free worker.
+        """
+        with self._lock:
+            return self._waiting
+
+    def status(self):
+        """
+        Returns one dict per worker with its state, PID, requests served by
+        the current process and in total, failures, restarts, uptime and
+        throughput (requests per second of the current process's uptime),
+        for status pages.
+        """
+        now = time.time()
+        rows = []
+        for worker in self._workers:
+            uptime = now - worker.started if worker.started and worker.process is not None else 0.0
+            rows.append({
+                "worker": worker.number,
+                "state": worker.state,
+                "pid": worker.process.pid if worker.process is not None else None,
+                "requests": worker.requests,
+                "total_requests": worker.total_requests,
+                "failures": worker.failures,
+                "restarts": worker.restarts,
+                "last_restart_reason": worker.last_restart_reason,
+                "uptime": uptime,
+                "throughput": worker.requests / uptime if uptime else 0.0,
+                "busy_seconds": worker.busy_seconds,
+                "last_health": worker.last_health,
+            })
+        return rows